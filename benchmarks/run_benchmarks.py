@@ -0,0 +1,112 @@
+"""
+End-to-end pipeline benchmark on seeded synthetic data.
+
+    python -m benchmarks.run_benchmarks --sizes 1000 10000 --out benchmark_results.json
+
+Each ``run_pipeline`` stage is invoked separately and timed; wall time,
+throughput (input rows/s) and peak memory growth per stage are written
+to a JSON results file together with the generator settings. Figures come
+from the spans recorded by ``src.tools.metrics_tools``; memory is sampled
+from the process RSS, and ``--tracemalloc`` additionally reports traced
+Python allocations instead, at a large slowdown of the pure-Python PDF parser.
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import SyntheticSpec, generate, erp_bytes, bank_pdf_bytes
+from src.tools.file_tools import read_erp_excel, read_bank_pdf
+from src.tools.normalize_tools import normalize_erp, normalize_bank
+from src.tools.match_tools import match_records
+from src.tools.discrepancy_tools import classify_discrepancies
+from src.tools.reporting_tools import export_outputs
+from src.tools.metrics_tools import collect
+
+def _stage(name: str, fn: Callable[[], Any], traced: Dict[str, float], trace: bool) -> Any:
+    if not trace:
+        return fn()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    out = fn()
+    traced[name] = round((tracemalloc.get_traced_memory()[1] - base) / 2**20, 2)
+    return out
+
+def _stage_entry(span: Dict[str, Any]) -> Dict[str, Any]:
+    rows = span["rows_in"] or span["rows_out"]
+    return {"seconds": round(span["wall_s"], 4), "cpu_seconds": round(span["cpu_s"], 4), "rows": rows,
+            "rows_per_sec": span["rows_per_s"], "peak_rss_delta_mb": span["peak_rss_delta_mb"]}
+
+def run_one(spec: SyntheticSpec, erp_format: str = "xlsx", pdf_workers: int = 1, trace: bool = False) -> Dict[str, Any]:
+    erp, bank, truth = generate(spec)
+    erp_raw, bank_raw = erp_bytes(erp, erp_format), bank_pdf_bytes(bank)
+    traced: Dict[str, float] = {}
+    if trace:
+        tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory() as out_dir, collect() as spans:
+            erp_table = _stage("read_erp_excel", lambda: read_erp_excel.invoke({"file_bytes": erp_raw}), traced, trace)
+            bank_table = _stage("read_bank_pdf", lambda: read_bank_pdf.invoke({"file_bytes": bank_raw, "workers": pdf_workers}), traced, trace)
+            erp_norm = _stage("normalize_erp", lambda: normalize_erp.invoke({"payload": erp_table}), traced, trace)
+            bank_norm = _stage("normalize_bank", lambda: normalize_bank.invoke({"payload": bank_table}), traced, trace)
+            matches = _stage("match_records", lambda: match_records.invoke({"payload": {"erp": erp_norm, "bank": bank_norm}}), traced, trace)
+            disc = _stage("classify_discrepancies", lambda: classify_discrepancies.invoke(
+                {"payload": {"erp": erp_norm, "bank": bank_norm, "matches": matches}}), traced, trace)
+            _stage("export_outputs", lambda: export_outputs.invoke(
+                {"payload": {"erp": erp_norm, "bank": bank_norm, "discrepancies": disc, "out_dir": out_dir}}), traced, trace)
+    finally:
+        if trace:
+            tracemalloc.stop()
+    stages = {s["stage"]: _stage_entry(s) for s in spans}
+    for name, mb in traced.items():
+        stages[name]["peak_traced_mb"] = mb
+    pairs = matches["matches"]
+    correct = int((truth[pairs["erp_index"].to_numpy()] == pairs["bank_index"].to_numpy()).sum())
+    return {
+        "spec": spec.as_dict(), "erp_format": erp_format, "pdf_workers": pdf_workers,
+        "input_bytes": {"erp": len(erp_raw), "bank": len(bank_raw)},
+        "stages": stages,
+        "total_seconds": round(sum(s["seconds"] for s in stages.values()), 4),
+        "matched": len(pairs), "correct_matches": correct, "match_accuracy": round(correct / max(len(erp), 1), 4),
+    }
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000], help="ERP/bank rows per run (1k to 1M)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--duplicate-rate", type=float, default=0.02)
+    ap.add_argument("--rounding-rate", type=float, default=0.05)
+    ap.add_argument("--missing-id-rate", type=float, default=0.10)
+    ap.add_argument("--date-skew-days", type=int, default=3)
+    ap.add_argument("--erp-format", choices=["xlsx", "csv", "parquet"], default="xlsx")
+    ap.add_argument("--pdf-workers", type=int, default=1)
+    ap.add_argument("--tracemalloc", action="store_true", help="also report peak traced Python allocations (slow)")
+    ap.add_argument("--out", default="benchmark_results.json")
+    args = ap.parse_args(argv)
+
+    runs = []
+    for size in args.sizes:
+        spec = SyntheticSpec(rows=size, seed=args.seed, duplicate_rate=args.duplicate_rate, rounding_rate=args.rounding_rate,
+                             missing_id_rate=args.missing_id_rate, date_skew_days=args.date_skew_days)
+        run = run_one(spec, erp_format=args.erp_format, pdf_workers=args.pdf_workers, trace=args.tracemalloc)
+        runs.append(run)
+        print(f"{size:>9} rows  total {run['total_seconds']:.2f}s  " +
+              "  ".join(f"{k}={v['seconds']:.2f}s" for k, v in run["stages"].items()))
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "runs": runs,
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Seeded synthetic ERP tables and bank statement PDFs for benchmarking the pipeline."""
+from dataclasses import dataclass, asdict
+from io import BytesIO
+from typing import Dict, Any, Tuple
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+
+STATUSES = np.array(["Paid", "Pending", "Cancelled"])
+BANK_COLUMNS = ("Date", "Description", "Amount", "Ref ID")
+_COL_WIDTHS = (2.6 * cm, 5.6 * cm, 3.0 * cm, 2.6 * cm)
+_ROW_HEIGHT = 0.6 * cm
+
+@dataclass
+class SyntheticSpec:
+    rows: int = 1_000
+    seed: int = 7
+    duplicate_rate: float = 0.02     # share of ERP rows reusing another row's Invoice ID
+    rounding_rate: float = 0.05      # share of bank amounts off by 0.01-0.05
+    missing_id_rate: float = 0.10    # share of bank descriptions without an INV reference
+    date_skew_days: int = 3          # bank dates drift up to +/- this many days
+    start_date: str = "2025-01-01"
+    period_days: int = 90
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def generate(spec: SyntheticSpec) -> Tuple[pd.DataFrame, pd.DataFrame, np.ndarray]:
+    """ERP frame, bank frame and ``truth`` where ``truth[i]`` is the bank row generated from ERP row ``i``."""
+    rng = np.random.default_rng(spec.seed)
+    n = spec.rows
+    ids = np.arange(1, n + 1)
+    dup = rng.random(n) < spec.duplicate_rate
+    ids[dup] = rng.integers(1, n + 1, dup.sum())
+    start = np.datetime64(spec.start_date)
+    days = rng.integers(0, spec.period_days, n)
+    amounts = np.round(rng.uniform(10, 10_000, n), 2)
+    erp = pd.DataFrame({
+        "Date": pd.to_datetime(start + days).strftime("%Y-%m-%d"),
+        "Invoice ID": [f"INV{i:04d}" for i in ids],
+        "Amount": amounts,
+        "Status": STATUSES[rng.integers(0, len(STATUSES), n)],
+    })
+
+    skew = rng.integers(-spec.date_skew_days, spec.date_skew_days + 1, n) if spec.date_skew_days else np.zeros(n, dtype=int)
+    noise = np.where(rng.random(n) < spec.rounding_rate, rng.choice([-1, 1], n) * rng.integers(1, 6, n) / 100, 0.0)
+    no_ref = rng.random(n) < spec.missing_id_rate
+    desc = np.where(no_ref, [f"Transfer {r:07d}" for r in rng.integers(0, 10**7, n)], "Payment " + erp["Invoice ID"].to_numpy())
+    bank = pd.DataFrame({
+        "Date": pd.to_datetime(start + days + skew).strftime("%Y-%m-%d"),
+        "Description": desc,
+        "Amount": np.round(amounts + noise, 2),
+    })
+    order = rng.permutation(n)
+    bank = bank.iloc[order].reset_index(drop=True)
+    bank["Ref ID"] = np.arange(1, n + 1).astype(str)
+    truth = np.empty(n, dtype=int); truth[order] = np.arange(n)
+    return erp, bank, truth
+
+def erp_bytes(erp: pd.DataFrame, fmt: str = "xlsx") -> bytes:
+    buf = BytesIO()
+    if fmt == "xlsx":
+        erp.to_excel(buf, index=False)
+    elif fmt == "csv":
+        erp.to_csv(buf, index=False)
+    elif fmt == "parquet":
+        erp.to_parquet(buf, index=False)
+    else:
+        raise ValueError(f"Unsupported ERP format {fmt!r}")
+    return buf.getvalue()
+
+def bank_pdf_bytes(bank: pd.DataFrame) -> bytes:
+    """Ruled statement table (header repeated on every page) drawn directly on the canvas."""
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    width, height = A4
+    x0 = (width - sum(_COL_WIDTHS)) / 2
+    xs = [x0]
+    for w in _COL_WIDTHS: xs.append(xs[-1] + w)
+    top = height - 2 * cm
+    per_page = int((top - 2 * cm) // _ROW_HEIGHT) - 1
+    values = bank[list(BANK_COLUMNS)].astype(str).to_numpy()
+    for start in range(0, max(len(values), 1), per_page):
+        rows = [BANK_COLUMNS] + [tuple(r) for r in values[start:start + per_page]]
+        bottom = top - len(rows) * _ROW_HEIGHT
+        for k in range(len(rows) + 1):
+            c.line(xs[0], top - k * _ROW_HEIGHT, xs[-1], top - k * _ROW_HEIGHT)
+        for x in xs:
+            c.line(x, top, x, bottom)
+        for k, row in enumerate(rows):
+            c.setFont("Helvetica-Bold" if k == 0 else "Helvetica", 9)
+            y = top - (k + 1) * _ROW_HEIGHT + 0.18 * cm
+            for x, text in zip(xs, row):
+                c.drawString(x + 0.15 * cm, y, text)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
@@ -1,25 +1,22 @@
-from langchain_core.messages import SystemMessage
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_openai import ChatOpenAI
-from ..config import settings
+from functools import lru_cache
+
 from ..tools.discrepancy_tools import classify_discrepancies
 from ..tools.log_tools import append_log
-from src.config import Settings
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+TOOLS = [classify_discrepancies, append_log]
 
 
+@lru_cache(maxsize=None)
 def build_auditor():
-     """Builds the MatcherAgent that reconciles ERP & Bank rows using Gemini.
+     """Builds the AuditorAgent that classifies discrepancies using Gemini.
 
      Author: Dr. Ayushi Mandlik
      """
-     settings = Settings()
-     llm = ChatGoogleGenerativeAI(
-         model=settings.model,         # e.g., "gemini-1.5-pro"
-         temperature=settings.temperature,
-         google_api_key=settings.google_api_key
-     )
+     from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+     from langchain.agents import AgentExecutor, create_tool_calling_agent
+     from .llm import build_llm
+
+     llm = build_llm()
 
      # Build a proper prompt
      prompt = ChatPromptTemplate.from_messages([
@@ -31,7 +28,7 @@ def build_auditor():
          MessagesPlaceholder(variable_name="agent_scratchpad")
      ])
 
-     tools = [classify_discrepancies, append_log]
+     tools = TOOLS
 
      # Use prompt, not list
      agent = create_tool_calling_agent(llm = llm, tools= tools, prompt = prompt)
@@ -1,42 +1,246 @@
-from typing import Dict, Any
-from .extractor_agent import build_extractor
-from .normalizer_agent import build_normalizer
-from .matcher_agent import build_matcher
-from .auditor_agent import build_auditor
-from .reporter_agent import build_reporter
+from typing import Callable, Dict, Any, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+import contextvars
+import os
+import random
+from . import extractor_agent, normalizer_agent, matcher_agent, auditor_agent, reporter_agent
 from ..tools.log_tools import append_log
+from ..tools.metrics_tools import collect, span, summarize, write_metrics
+from ..tools.profile_tools import profiling
+from ..tools.cache_tools import ExtractionCache
+from ..tools.file_tools import PARSER_VERSION, iter_bank_chunks, iter_erp_chunks
+from ..tools.ledger_tools import Ledger
+from ..tools.normalize_tools import NORMALIZER_VERSION
+from ..tools.table_tools import as_frame, compact, table
+from ..tools.run_context import run_context
+from ..config import settings
 
-def run_pipeline(erp_bytes: bytes, bank_bytes: bytes, out_dir: str = "outputs") -> Dict[str, Any]:
-    extractor = build_extractor()
-    normalizer = build_normalizer()
-    matcher = build_matcher()
-    auditor = build_auditor()
-    reporter = build_reporter()
-
-    append_log.invoke({"agent":"Coordinator","action":"start","message":"Extracting ERP & Bank"})
-    erp_table = extractor.tools[0].invoke({"file_bytes": erp_bytes})
-    bank_table = extractor.tools[1].invoke({"file_bytes": bank_bytes})
-    append_log.invoke({"agent":"ExtractorAgent","action":"done","message":"Parsed ERP & Bank"})
-
-    append_log.invoke({"agent":"Coordinator","action":"start","message":"Normalizing"})
-    erp_norm = normalizer.tools[0].invoke({"payload": erp_table})
-    bank_norm = normalizer.tools[1].invoke({"payload": bank_table})
-    append_log.invoke({"agent":"NormalizerAgent","action":"done","message":"Normalization complete"})
-
-    append_log.invoke({"agent":"Coordinator","action":"start","message":"Matching"})
-    match_payload = {"erp": erp_norm, "bank": bank_norm}
-    matches = matcher.tools[0].invoke({"payload": match_payload})
-    append_log.invoke({"agent":"MatcherAgent","action":"done","message":"Preliminary matches computed"})
-
-    append_log.invoke({"agent":"Coordinator","action":"start","message":"Classifying discrepancies"})
-    disc_payload = {"erp": erp_norm, "bank": bank_norm, "matches": matches}
-    discrepancies = auditor.tools[0].invoke({"payload": disc_payload})
-    append_log.invoke({"agent":"AuditorAgent","action":"done","message":"Discrepancies labeled"})
+_AGENTS = (
+    (extractor_agent, extractor_agent.build_extractor),
+    (normalizer_agent, normalizer_agent.build_normalizer),
+    (matcher_agent, matcher_agent.build_matcher),
+    (auditor_agent, auditor_agent.build_auditor),
+    (reporter_agent, reporter_agent.build_reporter),
+)
+
+def _toolkits(tools_only: bool) -> List[list]:
+    """Tool lists per agent; tools-only mode never builds an LLM client, agents are otherwise built once per process."""
+    if tools_only:
+        return [module.TOOLS for module, _ in _AGENTS]
+    return [build().tools for _, build in _AGENTS]
+
+def _submit(pool: ThreadPoolExecutor, fn, *args) -> Future:
+    """Run ``fn`` on the pool inside a copy of the caller's context (run log, metrics)."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+def _cached(kind: str, file_bytes: bytes, build: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Normalized table for ``file_bytes`` from the extraction cache, or ``build()`` it and store it."""
+    agent = "ERP" if kind == "erp" else "Bank"
+    cache = ExtractionCache(settings.cache_dir, settings.cache_max_mb * 2**20) if settings.cache_dir else None
+    key = ExtractionCache.key(kind, f"{PARSER_VERSION}.{NORMALIZER_VERSION}", file_bytes) if cache else None
+    if cache:
+        with span(f"cache_load_{kind}") as entry:
+            df = cache.get(key)
+            entry["rows_out"] = None if df is None else len(df)
+        if df is not None:
+            append_log.invoke({"agent":"Coordinator","action":"cache_hit","message":f"{agent} table loaded from cache {key[:12]}"})
+            return table(compact(df))
+    normalized = build()
+    append_log.invoke({"agent":"NormalizerAgent","action":"done","message":f"{agent} parsed & normalized"})
+    if cache:
+        cache.put(key, as_frame(normalized))
+    return normalized
+
+def _erp_branch(extractor: list, normalizer: list, erp_bytes: bytes) -> Dict[str, Any]:
+    append_log.invoke({"agent":"Coordinator","action":"start","message":"Extracting & normalizing ERP"})
+    return _cached("erp", erp_bytes, lambda: _extract_erp(extractor, normalizer, erp_bytes))
+
+def _bank_branch(extractor: list, normalizer: list, bank_bytes: bytes) -> Dict[str, Any]:
+    append_log.invoke({"agent":"Coordinator","action":"start","message":"Extracting & normalizing Bank"})
+    return _cached("bank", bank_bytes, lambda: _extract_bank(extractor, normalizer, bank_bytes))
+
+def _extract_erp(extractor: list, normalizer: list, erp_bytes: bytes) -> Dict[str, Any]:
+    erp_table = extractor[0].invoke({"file_bytes": erp_bytes})
+    return normalizer[0].invoke({"payload": erp_table})
+
+def _extract_bank(extractor: list, normalizer: list, bank_bytes: bytes) -> Dict[str, Any]:
+    bank_table = extractor[1].invoke({"file_bytes": bank_bytes, "workers": settings.pdf_workers, "chunk_pages": settings.pdf_chunk_pages,
+                                       "template_dir": settings.layout_dir})
+    return normalizer[1].invoke({"payload": bank_table})
+
+def _match_settings() -> Dict[str, Any]:
+    return {"fallback": settings.match_fallback, "amount_tolerance": settings.match_amount_tolerance,
+            "date_window_days": settings.match_date_window_days, "workers": settings.match_workers, "processes": settings.match_processes,
+            "splits": settings.match_splits, "split_window_days": settings.split_window_days,
+            "split_max_candidates": settings.split_max_candidates, "split_time_budget_ms": settings.split_time_budget_ms,
+            "split_max_searches": settings.split_max_searches, "split_by_date": settings.split_by_date}
+
+def _spill_branch(store, side: str, normalize, chunks) -> int:
+    from ..tools.partition_tools import spill
+    agent = "ERP" if side == "erp" else "Bank"
+    append_log.invoke({"agent":"Coordinator","action":"start","message":f"Spilling normalized {agent} rows to partitions"})
+    with span(f"spill_{side}") as entry:
+        entry["rows_out"] = n = spill(store, side, chunks, lambda df: as_frame(normalize.invoke({"payload": table(df)})))
+    append_log.invoke({"agent":"NormalizerAgent","action":"done","message":f"{agent} parsed & normalized ({n} rows spilled)"})
+    return n
+
+def _run_out_of_core(pool: ThreadPoolExecutor, normalizer: list, reporter: list, erp_bytes: bytes, bank_bytes: bytes,
+                     out_dir: str, concurrent: bool) -> Dict[str, Any]:
+    from ..tools.partition_tools import PartitionStore, reconcile_partitioned
+    store = PartitionStore(os.path.join(out_dir, "partitions"), settings.partition_buckets)
+    erp_chunks = iter_erp_chunks(erp_bytes, settings.spill_chunk_rows)
+    bank_chunks = iter_bank_chunks(bank_bytes, workers=settings.pdf_workers, chunk_pages=settings.pdf_chunk_pages, template_dir=settings.layout_dir)
+    if concurrent:
+        erp_future = _submit(pool, _spill_branch, store, "erp", normalizer[0], erp_chunks)
+        n_bank = _spill_branch(store, "bank", normalizer[1], bank_chunks)
+        n_erp = erp_future.result()
+    else:
+        n_erp = _spill_branch(store, "erp", normalizer[0], erp_chunks)
+        n_bank = _spill_branch(store, "bank", normalizer[1], bank_chunks)
+
+    append_log.invoke({"agent":"Coordinator","action":"start","message":"Matching & classifying partitions"})
+    with span("reconcile_partitioned") as entry:
+        # Partitions are small; a process pool per partition would cost more than it saves.
+        discrepancies = reconcile_partitioned(store, {**_match_settings(), "processes": 1})
+        entry["rows_out"] = sum(discrepancies["counts"].values())
+    append_log.invoke({"agent":"AuditorAgent","action":"done","message":f"Discrepancies labeled: {discrepancies['counts']}"})
 
     append_log.invoke({"agent":"Coordinator","action":"start","message":"Exporting outputs"})
+    erp_norm = {"dataset": store.path("erp"), "rows": n_erp}
+    bank_norm = {"dataset": store.path("bank"), "rows": n_bank}
     export_payload = {"erp": erp_norm, "bank": bank_norm, "discrepancies": discrepancies, "out_dir": out_dir}
-    outputs = reporter.tools[0].invoke({"payload": export_payload})
-    diagram = reporter.tools[1].invoke({"out_dir": out_dir})
-    logs = reporter.tools[2].invoke({"_": None})
+    diagram_future = _submit(pool, reporter[1].invoke, {"out_dir": out_dir}) if concurrent else None
+    outputs = reporter[0].invoke({"payload": export_payload, "parallel": concurrent, "formats": settings.export_formats.split(",")})
+    diagram = diagram_future.result() if diagram_future else reporter[1].invoke({"out_dir": out_dir})
+    return {"erp": erp_norm, "bank": bank_norm, "matches": None, "discrepancies": discrepancies, "outputs": outputs, "diagram": diagram}
+
+def _review(erp_norm: Dict[str, Any], bank_norm: Dict[str, Any], discrepancies: Dict[str, Any], matches: Dict[str, Any], llm) -> Dict[str, Any]:
+    from ..tools.review_tools import review_frame
+    if llm is None:
+        from .llm import build_llm
+        llm = build_llm()
+    append_log.invoke({"agent":"Coordinator","action":"start","message":"Reviewing low-confidence classifications"})
+    with span("review") as entry:
+        reviewed = review_frame(as_frame(erp_norm), as_frame(bank_norm), discrepancies["frame"], matches["matches"], llm,
+                                model=getattr(llm, "model", None) or getattr(llm, "_llm_type", ""), min_score=settings.review_min_score,
+                                statuses=[s.strip() for s in settings.review_statuses.split(",") if s.strip()],
+                                batch_size=settings.review_batch_size, concurrency=settings.review_concurrency,
+                                requests_per_minute=settings.review_requests_per_minute, cache_dir=settings.review_cache_dir,
+                                max_rows=settings.review_max_rows)
+        entry["rows_out"] = reviewed["escalated"]
+    append_log.invoke({"agent":"AuditorAgent","action":"review","message":f"{reviewed['escalated']} rows escalated: {reviewed['cached']} cached, "
+                       f"{reviewed['answered']} answered in {reviewed['prompts']} prompts ({reviewed['failed_prompts']} failed)"})
+    return {"frame": reviewed["frame"]}
+
+def _profiling(profile: bool, sample_rate: float):
+    if profile and random.random() < sample_rate:
+        return profiling(top_n=settings.profile_top_n, memory=settings.profile_memory, interval_ms=settings.profile_interval_ms)
+    return nullcontext()
+
+def _finish(spans: List[Dict[str, Any]], profile, out_dir: str):
+    metrics = summarize(spans)
+    metrics["path"] = write_metrics(spans, out_dir)
+    return metrics, profile.write(out_dir) if profile is not None else None
+
+def run_pipeline(erp_bytes: bytes, bank_bytes: bytes, out_dir: str = "outputs", tools_only: Optional[bool] = None,
+                 run_id: Optional[str] = None, concurrent: Optional[bool] = None, ledger_dir: Optional[str] = None,
+                 out_of_core: Optional[bool] = None, review: Optional[bool] = None, review_llm=None,
+                 profile: Optional[bool] = None, profile_sample_rate: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Reconcile one ERP/bank pair. Each call is an isolated run with its own id, log buffer and output directory.
+
+    With ``concurrent`` (default: the CONCURRENT_STAGES setting) the ERP and bank
+    extract -> normalize branches run side by side and join at matching, and the
+    report files and workflow diagram are written in parallel.
+
+    With a ``ledger_dir`` (default: the LEDGER_DIR setting) the run is incremental:
+    only input rows the ledger hasn't seen are matched, together with the items
+    still open from earlier runs, and only classifications that changed are
+    reported. Matched pairs are closed and never re-matched.
+
+    With ``out_of_core`` (default: the OUT_OF_CORE setting) inputs are read and
+    normalized in chunks and spilled to Parquet partitions under the run
+    directory, matched partition by partition (see
+    ``partition_tools.reconcile_partitioned``) and streamed into the report
+    files, so memory stays bounded by the partition size rather than
+    the input size. Stage payloads are then ``{"dataset": path}`` references.
+
+    With ``review`` (default: the REVIEW setting) low-confidence classifications
+    (match score below REVIEW_MIN_SCORE, or a status in REVIEW_STATUSES) are
+    sent in batches to ``review_llm`` (default: the shared Gemini client) and its
+    verdicts are added as a ``review`` column; see ``review_tools.review_frame``.
+
+    With ``profile`` (default: the PROFILE setting) a share ``profile_sample_rate``
+    of runs is profiled: every stage under cProfile and tracemalloc plus stack
+    sampling, written to ``profile.txt``/``.json``/``.collapsed`` in the run
+    directory (paths returned as ``profile``); see ``profile_tools.RunProfile``.
+    """
+    extractor, normalizer, matcher, auditor, reporter = _toolkits(settings.tools_only if tools_only is None else tools_only)
+    concurrent = settings.concurrent_stages if concurrent is None else concurrent
+    ledger_dir = settings.ledger_dir if ledger_dir is None else ledger_dir
+    out_of_core = settings.out_of_core if out_of_core is None else out_of_core
+    review = settings.review if review is None else review
+    profile = settings.profile if profile is None else profile
+    profile_sample_rate = settings.profile_sample_rate if profile_sample_rate is None else profile_sample_rate
+    if out_of_core and ledger_dir:
+        raise ValueError("Out-of-core runs can't be combined with an incremental ledger")
+    if out_of_core and review:
+        raise ValueError("Out-of-core runs can't be combined with model review")
+
+    with run_context(out_dir, run_id, scoped=settings.run_scoped_outputs, log_limit=settings.log_limit) as run, collect() as spans, \
+            _profiling(profile, profile_sample_rate) as profiler, ThreadPoolExecutor(max_workers=2 if concurrent else 1, thread_name_prefix=f"run-{run.run_id}") as pool:
+        out_dir = run.out_dir
+        if out_of_core:
+            result = _run_out_of_core(pool, normalizer, reporter, erp_bytes, bank_bytes, out_dir, concurrent)
+            logs = reporter[2].invoke({"_": None})
+            metrics, profile_paths = _finish(spans, profiler, out_dir)
+            return {**result, "logs": logs, "metrics": metrics, "profile": profile_paths, "delta": None, "run_id": run.run_id, "out_dir": out_dir}
+        if concurrent:
+            erp_future = _submit(pool, _erp_branch, extractor, normalizer, erp_bytes)
+            bank_norm = _bank_branch(extractor, normalizer, bank_bytes)
+            erp_norm = erp_future.result()
+        else:
+            erp_norm = _erp_branch(extractor, normalizer, erp_bytes)
+            bank_norm = _bank_branch(extractor, normalizer, bank_bytes)
+        if ledger_dir:
+            ledger = Ledger.load(ledger_dir)
+            erp_work, erp_fp, new_erp = ledger.working_set("erp", as_frame(erp_norm))
+            bank_work, bank_fp, new_bank = ledger.working_set("bank", as_frame(bank_norm))
+            erp_norm, bank_norm = table(erp_work), table(bank_work)
+            append_log.invoke({"agent":"Coordinator","action":"ledger","message":f"Delta: {new_erp} new ERP / {new_bank} new bank rows; "
+                               f"{len(erp_work) - new_erp} ERP / {len(bank_work) - new_bank} bank items still open"})
+
+        append_log.invoke({"agent":"Coordinator","action":"start","message":"Matching"})
+        match_payload = {"erp": erp_norm, "bank": bank_norm}
+        matches = matcher[0].invoke({"payload": match_payload, **_match_settings()})
+        append_log.invoke({"agent":"MatcherAgent","action":"done","message":"Preliminary matches computed"})
+
+        append_log.invoke({"agent":"Coordinator","action":"start","message":"Classifying discrepancies"})
+        disc_payload = {"erp": erp_norm, "bank": bank_norm, "matches": matches}
+        discrepancies = auditor[0].invoke({"payload": disc_payload, "processes": settings.match_processes})
+        append_log.invoke({"agent":"AuditorAgent","action":"done","message":"Discrepancies labeled"})
+        delta = None
+        if ledger_dir:
+            results = discrepancies["frame"]
+            changed = ledger.update(erp_work, erp_fp, bank_work, bank_fp, results)
+            ledger.save(run.run_id)
+            discrepancies = {"frame": results.loc[changed].reset_index(drop=True)}
+            delta = {"new_erp_rows": new_erp, "new_bank_rows": new_bank, "open_erp_rows": len(ledger.erp_open),
+                     "open_bank_rows": len(ledger.bank_open), "changed": int(changed.sum()), "classified": len(results)}
+            append_log.invoke({"agent":"Coordinator","action":"ledger","message":f"{delta['changed']} of {len(results)} classifications changed; ledger saved"})
+
+        if review:
+            discrepancies = _review(erp_norm, bank_norm, discrepancies, matches, review_llm)
+
+        append_log.invoke({"agent":"Coordinator","action":"start","message":"Exporting outputs"})
+        export_payload = {"erp": erp_norm, "bank": bank_norm, "discrepancies": discrepancies, "out_dir": out_dir}
+        diagram_future = _submit(pool, reporter[1].invoke, {"out_dir": out_dir}) if concurrent else None
+        outputs = reporter[0].invoke({"payload": export_payload, "parallel": concurrent, "formats": settings.export_formats.split(",")})
+        diagram = diagram_future.result() if diagram_future else reporter[1].invoke({"out_dir": out_dir})
+        logs = reporter[2].invoke({"_": None})
+        metrics, profile_paths = _finish(spans, profiler, out_dir)
 
-    return {"erp": erp_norm, "bank": bank_norm, "matches": matches, "discrepancies": discrepancies, "outputs": outputs, "diagram": diagram, "logs": logs}
+    # Stage payloads are columnar; callers needing dicts convert with table_tools.to_records.
+    return {"erp": erp_norm, "bank": bank_norm, "matches": matches, "discrepancies": discrepancies, "outputs": outputs, "diagram": diagram, "logs": logs, "metrics": metrics,
+            "profile": profile_paths, "delta": delta, "run_id": run.run_id, "out_dir": out_dir}
@@ -1,28 +1,27 @@
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
+from functools import lru_cache
 
-from src.config import Settings
 from src.tools.file_tools import read_erp_excel, read_bank_pdf
 from src.tools.log_tools import append_log
 
+TOOLS = [read_erp_excel, read_bank_pdf, append_log]
 
+
+@lru_cache(maxsize=None)
 def build_extractor():
     """
     Build the Extractor Agent.
 
     Uses Gemini (Google Generative AI) model for extraction tasks.
-    Configured via settings.
+    Configured via settings. Built once per process; the LangChain
+    agent stack is only imported here.
 
     Author: Dr. Ayushi Mandlik
     """
-    settings = Settings()
-    llm = ChatGoogleGenerativeAI(
-        model=settings.model,
-        temperature=settings.temperature,
-        google_api_key=settings.google_api_key
-    )
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from .llm import build_llm
 
+    llm = build_llm()
 
     prompt = ChatPromptTemplate.from_messages([
         ("system",
@@ -32,7 +31,7 @@ def build_extractor():
         MessagesPlaceholder(variable_name="agent_scratchpad")
     ])
 
-    tools = [read_erp_excel, read_bank_pdf, append_log]
+    tools = TOOLS
 
     agent = create_tool_calling_agent(
         llm=llm,
@@ -0,0 +1,21 @@
+from functools import lru_cache
+
+from src.config import Settings
+
+
+@lru_cache(maxsize=None)
+def build_llm():
+    """Shared Gemini chat client for all agents, created on first use.
+
+    Author: Dr. Ayushi Mandlik
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    settings = Settings()
+    if not settings.google_api_key:
+        raise ValueError("GOOGLE_API_KEY is not set; provide it or run the pipeline with tools_only=True.")
+    return ChatGoogleGenerativeAI(
+        model=settings.model,         # e.g., "gemini-1.5-pro"
+        temperature=settings.temperature,
+        google_api_key=settings.google_api_key
+    )
@@ -1,24 +1,22 @@
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import SystemMessage
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
+from functools import lru_cache
 
-from src.config import Settings
-from src.tools.match_tools import match_records
+from src.tools.match_tools import match_candidates, match_records
 from src.tools.log_tools import append_log
 
+TOOLS = [match_records, append_log, match_candidates]
 
+
+@lru_cache(maxsize=None)
 def build_matcher():
     """Builds the MatcherAgent that reconciles ERP & Bank rows using Gemini.
 
     Author: Dr. Ayushi Mandlik
     """
-    settings = Settings()
-    llm = ChatGoogleGenerativeAI(
-        model=settings.model,         # e.g., "gemini-1.5-pro"
-        temperature=settings.temperature,
-        google_api_key=settings.google_api_key
-    )
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from .llm import build_llm
+
+    llm = build_llm()
 
     # Build a proper prompt
 
@@ -31,7 +29,7 @@ def build_matcher():
         MessagesPlaceholder(variable_name="agent_scratchpad")
     ])
 
-    tools = [match_records, append_log]
+    tools = TOOLS
 
     # Use prompt, not list
     agent = create_tool_calling_agent(llm = llm, tools= tools, prompt = prompt)
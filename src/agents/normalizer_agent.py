@@ -1,23 +1,21 @@
-from langchain_core.messages import SystemMessage
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
+from functools import lru_cache
 
-from src.config import Settings
 from src.tools.normalize_tools import normalize_erp, normalize_bank
 from src.tools.log_tools import append_log
 
+TOOLS = [normalize_erp, normalize_bank, append_log]
+
+@lru_cache(maxsize=None)
 def build_normalizer():
     """Builds the NormalizerAgent that cleans and standardizes ERP & Bank data.
 
     Author: Dr. Ayushi Mandlik
     """
-    settings = Settings()
-    llm = ChatGoogleGenerativeAI(
-        model=settings.model,
-        temperature=settings.temperature,
-        google_api_key=settings.google_api_key
-    )
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from .llm import build_llm
+
+    llm = build_llm()
 
     prompt = ChatPromptTemplate.from_messages([
         ("system",
@@ -30,7 +28,7 @@ def build_normalizer():
         MessagesPlaceholder(variable_name="agent_scratchpad")  # ✅ Explicit variable_name
     ])
 
-    tools = [normalize_erp, normalize_bank, append_log]
+    tools = TOOLS
 
     agent = create_tool_calling_agent(
         llm=llm,
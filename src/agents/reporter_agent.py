@@ -1,25 +1,23 @@
-from langchain_core.messages import SystemMessage
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from ..config import settings
+from functools import lru_cache
+
 from ..tools.reporting_tools import export_outputs
 from ..tools.diagram_tools import generate_mermaid
 from ..tools.log_tools import get_logs, append_log
+from ..tools.metrics_tools import get_metrics
 
-from src.config import Settings
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+TOOLS = [export_outputs, generate_mermaid, get_logs, append_log, get_metrics]
 
+@lru_cache(maxsize=None)
 def build_reporter():
-     """Builds the MatcherAgent that reconciles ERP & Bank rows using Gemini.
+     """Builds the ReporterAgent that produces the final outputs using Gemini.
 
      Author: Dr. Ayushi Mandlik
      """
-     settings = Settings()
-     llm = ChatGoogleGenerativeAI(
-         model=settings.model,         # e.g., "gemini-1.5-pro"
-         temperature=settings.temperature,
-         google_api_key=settings.google_api_key
-     )
+     from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+     from langchain.agents import AgentExecutor, create_tool_calling_agent
+     from .llm import build_llm
+
+     llm = build_llm()
 
      # Build a proper prompt
      prompt = ChatPromptTemplate.from_messages([
@@ -31,7 +29,7 @@ def build_reporter():
          MessagesPlaceholder(variable_name="agent_scratchpad")
      ])
 
-     tools = [export_outputs, generate_mermaid, get_logs, append_log]
+     tools = TOOLS
 
      # Use prompt, not list
      agent = create_tool_calling_agent(llm = llm, tools= tools, prompt = prompt)
@@ -0,0 +1,164 @@
+"""
+Headless batch reconciliation of many ERP/bank pairs.
+
+    python -m src.batch manifest.csv --out outputs/close-2025-06 --workers 8
+
+The manifest is a CSV (or JSON Lines) file with ``job_id``, ``erp`` and ``bank``
+columns; relative paths are resolved against the manifest's directory. Jobs run
+on a pool of ``--workers`` processes that import the pipeline and build the
+agents once and are then reused for every job they pick up. Each job is one
+``run_pipeline`` call writing into ``<out>/<job_id>``.
+
+With ``--profile`` every job (or a fraction ``--profile RATE`` of them) writes a
+CPU and allocation profile next to its reports (see ``run_pipeline``).
+
+Every finished job (ok or failed, with timing and status counts) is appended to
+``<out>/batch_journal.jsonl`` as soon as it completes. Re-running the same
+command after a crash skips the jobs the journal records as ok and retries the
+rest; ``--rerun`` ignores the journal.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Set
+
+from .config import settings
+
+JOURNAL = "batch_journal.jsonl"
+_TOOLS_ONLY: Optional[bool] = None
+_PROFILE: Optional[float] = None
+
+def read_manifest(path: str) -> List[Dict[str, str]]:
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    jobs, seen = [], set()
+    for n, row in enumerate(rows, 1):
+        if not row.get("erp") or not row.get("bank"):
+            raise ValueError(f"Manifest row {n} needs both 'erp' and 'bank' paths")
+        job_id = str(row.get("job_id") or os.path.splitext(os.path.basename(row["erp"]))[0])
+        if os.path.basename(job_id) != job_id or job_id in (".", ".."):
+            raise ValueError(f"job_id {job_id!r} in manifest row {n} must be a plain file name (it names the job's output directory)")
+        if job_id in seen:
+            raise ValueError(f"Duplicate job_id {job_id!r} in manifest row {n}")
+        seen.add(job_id)
+        jobs.append({"job_id": job_id, "erp": os.path.join(base, row["erp"]), "bank": os.path.join(base, row["bank"])})
+    return jobs
+
+def finished_jobs(out_dir: str) -> Set[str]:
+    """Job ids the journal records as ok; a torn last line from a crash is ignored."""
+    done = set()
+    try:
+        with open(os.path.join(out_dir, JOURNAL)) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("status") == "ok":
+                    done.add(entry["job_id"])
+                else:
+                    done.discard(entry["job_id"])
+    except OSError:
+        pass
+    return done
+
+def _append(out_dir: str, entry: Dict[str, Any]) -> None:
+    with open(os.path.join(out_dir, JOURNAL), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def _init_worker(tools_only: Optional[bool], profile: Optional[float] = None) -> None:
+    """Warm a pool worker: import the pipeline and build the agents (or tool lists) once."""
+    global _TOOLS_ONLY, _PROFILE
+    _TOOLS_ONLY, _PROFILE = tools_only, profile
+    from .agents import coordinator
+    coordinator._toolkits(settings.tools_only if tools_only is None else tools_only)
+
+def _status_counts(result: Dict[str, Any]) -> Dict[str, int]:
+    disc = result["discrepancies"]
+    if "counts" in disc:
+        return dict(disc["counts"])
+    return {k: int(v) for k, v in disc["frame"]["status"].value_counts().items()}
+
+def run_job(job: Dict[str, str], out_dir: str) -> Dict[str, Any]:
+    """One manifest entry through ``run_pipeline``; failures are returned, not raised."""
+    from .agents.coordinator import run_pipeline
+    start = time.perf_counter()
+    entry = {"job_id": job["job_id"], "pid": os.getpid()}
+    try:
+        with open(job["erp"], "rb") as f:
+            erp_bytes = f.read()
+        with open(job["bank"], "rb") as f:
+            bank_bytes = f.read()
+        profile = {"profile": True, "profile_sample_rate": _PROFILE} if _PROFILE is not None else {}
+        result = run_pipeline(erp_bytes, bank_bytes, out_dir=out_dir, tools_only=_TOOLS_ONLY, run_id=job["job_id"], **profile)
+        entry.update(status="ok", out_dir=result["out_dir"], counts=_status_counts(result),
+                     outputs={k: v for k, v in result["outputs"].items() if v})
+        if result.get("profile"):
+            entry["profile"] = result["profile"]["txt"]
+    except Exception as e:
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}")
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+def run_batch(jobs: List[Dict[str, str]], out_dir: str, workers: int = 1, tools_only: Optional[bool] = None,
+              resume: bool = True, report=print, profile: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Run ``jobs`` on ``workers`` warm processes, journaling each result; returns this invocation's entries."""
+    if not settings.run_scoped_outputs:
+        # Without run-scoped outputs every job would write into ``out_dir`` itself and overwrite the others' reports.
+        raise ValueError("Batch runs write one directory per job and need RUN_SCOPED_OUTPUTS=true")
+    os.makedirs(out_dir, exist_ok=True)
+    done = finished_jobs(out_dir) if resume else set()
+    todo = [job for job in jobs if job["job_id"] not in done]
+    if done:
+        report(f"resuming: {len(jobs) - len(todo)} of {len(jobs)} jobs already done")
+    entries: List[Dict[str, Any]] = []
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(todo) or 1)), initializer=_init_worker, initargs=(tools_only, profile)) as pool:
+        futures = {pool.submit(run_job, job, out_dir): job for job in todo}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                entry = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory); the rest of the batch can't continue on this pool.
+                entry = {"job_id": job["job_id"], "status": "failed", "error": f"worker crashed: {e}", "seconds": None}
+            _append(out_dir, entry)
+            entries.append(entry)
+            counts = "  ".join(f"{k}={v}" for k, v in sorted(entry.get("counts", {}).items()))
+            report(f"[{len(done) + len(entries)}/{len(jobs)}] {entry['job_id']}  {entry['status']}  "
+                   f"{entry['seconds'] if entry['seconds'] is not None else '-'}s  {counts or entry.get('error', '')}")
+    return entries
+
+def main(argv: List[str] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("manifest", help="CSV or JSON Lines file with job_id, erp and bank columns")
+    ap.add_argument("--out", default=settings.out_dir, help="batch output directory (one subdirectory per job)")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="concurrent jobs")
+    ap.add_argument("--tools-only", action="store_true", help="run the tools directly, without building LLM agents")
+    ap.add_argument("--rerun", action="store_true", help="ignore the journal and run every job again")
+    ap.add_argument("--profile", nargs="?", type=float, const=1.0, metavar="RATE",
+                    help="write a CPU/allocation profile per job (for a fraction RATE of the jobs; default all)")
+    args = ap.parse_args(argv)
+
+    jobs = read_manifest(args.manifest)
+    start = time.perf_counter()
+    entries = run_batch(jobs, args.out, workers=args.workers, tools_only=True if args.tools_only else None, resume=not args.rerun,
+                        profile=args.profile)
+    failed = [e["job_id"] for e in entries if e["status"] != "ok"]
+    print(f"{len(entries) - len(failed)} ok, {len(failed)} failed in {time.perf_counter() - start:.1f}s; journal: {os.path.join(args.out, JOURNAL)}")
+    if failed:
+        print("failed: " + ", ".join(failed), file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
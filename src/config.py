@@ -1,11 +1,50 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
 
     model: str = "gemini-1.5-pro"
     temperature: float = 0.2
-    google_api_key: str
+    google_api_key: Optional[str] = None
+    tools_only: bool = False
     out_dir: str = "./outputs"
+    pdf_workers: int = 1
+    pdf_chunk_pages: int = 25
+    layout_dir: str = "./layouts"
+    run_scoped_outputs: bool = True
+    log_limit: int = 10_000
+    concurrent_stages: bool = True
+    cache_dir: str = "./cache"
+    cache_max_mb: int = 1024
+    ledger_dir: str = ""
+    match_fallback: bool = True
+    match_amount_tolerance: float = 0.05
+    match_date_window_days: int = 3
+    match_workers: int = 1
+    match_processes: int = 1
+    match_splits: bool = True
+    split_window_days: int = 30
+    split_max_candidates: int = 20
+    split_time_budget_ms: int = 50
+    split_max_searches: int = 10_000
+    split_by_date: bool = False
+    export_formats: str = "csv,xlsx,pdf"
+    review: bool = False
+    review_min_score: float = 60.0
+    review_statuses: str = "Amount mismatch"
+    review_batch_size: int = 25
+    review_concurrency: int = 4
+    review_requests_per_minute: float = 60.0
+    review_max_rows: int = 2_000
+    review_cache_dir: str = "./cache/review"
+    profile: bool = False
+    profile_sample_rate: float = 1.0
+    profile_top_n: int = 25
+    profile_memory: bool = True
+    profile_interval_ms: float = 5.0
+    out_of_core: bool = False
+    partition_buckets: int = 16
+    spill_chunk_rows: int = 100_000
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,70 @@
+from typing import Optional
+import hashlib
+import os
+import uuid
+import pandas as pd
+
+class ExtractionCache:
+    """
+    Content-addressed on-disk cache of normalized input tables.
+
+    Entries are Parquet files named by ``key()`` (a sha256 of the uploaded bytes
+    plus the parser/normalizer versions), so unchanged inputs skip extraction and
+    a parser change invalidates old entries by construction. Reads touch the
+    file's mtime; writes evict least-recently-used entries beyond ``max_bytes``.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root, self.max_bytes = root, max_bytes
+
+    @staticmethod
+    def key(kind: str, version: str, file_bytes: bytes) -> str:
+        h = hashlib.sha256(f"{kind}:{version}:".encode())
+        h.update(file_bytes)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.parquet")
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except (OSError, ValueError, TypeError, pa.ArrowException):
+            # Columns pyarrow can't store (mixed or unsupported types): skip caching, never fail the run.
+            if os.path.exists(tmp): os.remove(tmp)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        with os.scandir(self.root) as it:
+            for e in it:
+                if e.name.endswith(".parquet"):
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -1,4 +1,6 @@
-from langchain.tools import tool
+from langchain_core.tools import tool
+from .metrics_tools import instrument
+from .run_context import current_run
 import os
 
 MERMAID = '''flowchart TD
@@ -11,13 +13,14 @@ MERMAID = '''flowchart TD
 '''
 
 @tool("generate_mermaid")
-def generate_mermaid(out_dir: str = "outputs") -> dict:
+@instrument("generate_mermaid")
+def generate_mermaid(out_dir: str = "") -> dict:
     """
     Generate a reconciliation process diagram in Mermaid syntax and save it as an output file.
 
     Args:
         out_dir (str, optional): Directory where the generated Mermaid diagram will be saved.
-                                 Defaults to "outputs".
+                                 Defaults to the current run's directory, else "outputs".
 
     Returns:
         dict: Metadata containing the file path and diagram content.
@@ -25,6 +28,8 @@ def generate_mermaid(out_dir: str = "outputs") -> dict:
     Author:
         Dr. Ayushi Mandlik
     """
+    run = current_run()
+    out_dir = out_dir or (run.out_dir if run else "outputs")
     os.makedirs(out_dir, exist_ok=True)
     path = os.path.join(out_dir, "workflow.mmd")
     with open(path, "w") as f:
@@ -1,54 +1,177 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from langchain.tools import tool
+from langchain_core.tools import tool
+from .metrics_tools import instrument
+from .table_tools import as_frame, cents, keys
+from .shard_tools import SharedColumns, init_worker, worker_columns
+
+ROUNDING_TOLERANCE = 0.05
+_TOLERANCE_CENTS = round(ROUNDING_TOLERANCE * 100)
+_SHARD_FRAMES = None
+
+_NO_KEYS = ("", "NAN", "NONE")
+
+def _invoice_keys(df: pd.DataFrame) -> np.ndarray:
+    """``keys`` with missing-ID placeholders (blank, "NAN", "NONE") as ""."""
+    inv = keys(df)
+    return np.where(np.isin(inv, _NO_KEYS), "", inv)
+
+def duplicate_keys(df: pd.DataFrame) -> set:
+    """Invoice keys that occur more than once in ``df``; missing IDs are never duplicates."""
+    counts = pd.Series(_invoice_keys(df)).value_counts()
+    return set(counts.index[counts > 1]) - {""}
+
+def _classify_pairs(erp_df: pd.DataFrame, bank_df: pd.DataFrame, erp_idx: np.ndarray, bank_idx: np.ndarray, dup_keys: Optional[set] = None) -> pd.DataFrame:
+    diff = np.abs(cents(erp_df)[erp_idx] - cents(bank_df)[bank_idx])
+    exact, rounding = diff == 0, diff <= _TOLERANCE_CENTS
+    if "Amount" not in erp_df or "Amount" not in bank_df:
+        diff = np.full(len(erp_idx), None, dtype=object)
+
+    inv = _invoice_keys(erp_df)[erp_idx]
+    if dup_keys is None:
+        dup_keys = duplicate_keys(erp_df) | duplicate_keys(bank_df)
+    duplicate = (inv != "") & np.isin(inv, list(dup_keys))
+    return pd.DataFrame({"erp_index": erp_idx, "bank_index": bank_idx, "amount_diff": diff,
+                         "exact": exact, "rounding": rounding, "duplicate": duplicate})
+
+def _rationale(diff_cents, exact: bool, rounding: bool, duplicate: bool):
+    diff = None if diff_cents is None else diff_cents / 100
+    if diff is None:
+        label, rationale = "Matched", []
+    elif exact:
+        label, rationale = "Matched", ["Exact amount match."]
+    elif rounding:
+        label, rationale = "Rounding difference", [f"Amounts differ by {diff}, within rounding tolerance (≤ {ROUNDING_TOLERANCE})."]
+    else:
+        label, rationale = "Amount mismatch", [f"Amounts differ by {diff} (> {ROUNDING_TOLERANCE})."]
+    if duplicate:
+        label = "Duplicate"; rationale.append("Invoice ID appears multiple times in one dataset.")
+    return label, rationale
+
+def _split_rationales(groups: pd.DataFrame):
+    out = []
+    sizes = groups.groupby("group").agg(erp=("erp_index", "nunique"), bank=("bank_index", "nunique"))
+    for g, by_date in zip(groups["group"].tolist(), groups["by_date"].tolist()):
+        n_erp, n_bank = sizes.at[g, "erp"], sizes.at[g, "bank"]
+        if by_date:
+            out.append([f"Bank transaction may settle {n_erp} ERP records (split group {g}); amounts sum exactly, "
+                        "but it references no invoice and the records were grouped by date only."])
+        elif n_bank == 1:
+            out.append([f"Bank transaction settles {n_erp} ERP records (split group {g}); amounts sum exactly."])
+        else:
+            out.append([f"ERP record paid in {n_bank} bank transactions (split group {g}); amounts sum exactly."])
+    return out
+
+def _shard_frames():
+    """ERP/bank frames rebuilt from the worker's shared columns (Amount and cleaned Invoice ID only)."""
+    global _SHARD_FRAMES
+    if _SHARD_FRAMES is None:
+        cols = worker_columns()
+        names = np.array([cols["names"][k] for k in range(len(cols["names"]))] + [""], dtype=object)
+        erp_df = pd.DataFrame({"Invoice ID": names[cols["erp_key"]]})
+        bank_df = pd.DataFrame(index=range(len(cols["bank_amount"])) if "bank_amount" in cols.columns else None)
+        if "erp_amount" in cols.columns: erp_df["Amount"] = cols["erp_amount"]
+        if "bank_amount" in cols.columns: bank_df["Amount"] = cols["bank_amount"]
+        _SHARD_FRAMES = (erp_df, bank_df)
+    return _SHARD_FRAMES
+
+def _classify_shard(start: int, stop: int, rest: Optional[Dict[str, Any]], dup_keys: set) -> pd.DataFrame:
+    """Classification of the pairs ``start:stop`` (plus ``rest``: groups and unmatched rows, in the last shard) (pool task)."""
+    cols = worker_columns()
+    erp_df, bank_df = _shard_frames()
+    pairs = pd.DataFrame({"erp_index": cols["pair_erp"][start:stop], "bank_index": cols["pair_bank"][start:stop]})
+    rest = rest or {"groups": None, "erp_unmatched": [], "bank_unmatched": []}
+    return classify_frames(erp_df, bank_df, {"matches": pairs, **rest}, dup_keys)
+
+def _classify_sharded(erp_df: pd.DataFrame, bank_df: pd.DataFrame, pairs: pd.DataFrame, matches: Dict[str, Any],
+                      dup_keys: set, processes: int) -> pd.DataFrame:
+    """
+    ``classify_frames`` on a process pool: the pairs are cut into contiguous
+    shards, with groups and unmatched rows in the last one, so concatenating the
+    shard results in order gives exactly the serial frame. Amounts, Invoice ID
+    codes and pairs reach the workers through shared memory.
+    """
+    codes, names = pd.factorize(keys(erp_df))
+    arrays = {"erp_key": codes, "pair_erp": pairs["erp_index"].to_numpy(dtype=np.int64), "pair_bank": pairs["bank_index"].to_numpy(dtype=np.int64)}
+    if "Amount" in erp_df: arrays["erp_amount"] = cents(erp_df)
+    if "Amount" in bank_df: arrays["bank_amount"] = cents(bank_df)
+    bounds = np.linspace(0, len(pairs), processes + 1).astype(int)
+    rest = {"groups": matches.get("groups"), "erp_unmatched": matches["erp_unmatched"], "bank_unmatched": matches["bank_unmatched"]}
+    with SharedColumns.create(arrays, {"names": names.astype(str)}) as shared, \
+            ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(shared.spec,)) as pool:
+        parts = list(pool.map(_classify_shard, bounds[:-1], bounds[1:], [None] * (processes - 1) + [rest], [dup_keys] * processes))
+    return pd.concat(parts, ignore_index=True)
+
+def classify_frames(erp_df: pd.DataFrame, bank_df: pd.DataFrame, matches: Dict[str, Any], dup_keys: Optional[set] = None,
+                    processes: int = 1) -> pd.DataFrame:
+    """
+    Classification frame for one match result; ``dup_keys`` overrides the per-frame
+    duplicate Invoice ID lookup and ``processes`` > 1 classifies shards of the pairs
+    on a process pool (same result).
+    """
+    pairs = pd.DataFrame(matches["matches"], columns=["erp_index", "bank_index"]).astype(int)
+    pairs = pairs.drop_duplicates()
+    if processes > 1:
+        if dup_keys is None:
+            dup_keys = duplicate_keys(erp_df) | duplicate_keys(bank_df)
+        return _classify_sharded(erp_df, bank_df, pairs, matches, dup_keys, processes)
+    erp_unmatched = np.unique(np.asarray(matches["erp_unmatched"], dtype=int))
+    bank_unmatched = np.unique(np.asarray(matches["bank_unmatched"], dtype=int))
+    cls = _classify_pairs(erp_df, bank_df, pairs["erp_index"].to_numpy(), pairs["bank_index"].to_numpy(), dup_keys)
+
+    labels, rationales = [], []
+    for diff, exact, rounding, duplicate in zip(cls["amount_diff"].tolist(), cls["exact"].tolist(), cls["rounding"].tolist(), cls["duplicate"].tolist()):
+        label, rationale = _rationale(diff, exact, rounding, duplicate)
+        labels.append(label); rationales.append(rationale)
+    groups = matches.get("groups")
+    groups = pd.DataFrame(groups if groups is not None else [], columns=["group", "erp_index", "bank_index", "by_date"])
+    groups = groups.astype({"group": int, "erp_index": int, "bank_index": int}).assign(by_date=groups["by_date"].fillna(False).astype(bool))
+    cls = pd.concat([cls[["erp_index", "bank_index"]], groups[["erp_index", "bank_index"]]], ignore_index=True).assign(
+        amount_diff=list(cls["amount_diff"]) + [0] * len(groups))
+    labels += np.where(groups["by_date"], "Possible split payment", "Split payment").tolist()
+    rationales += _split_rationales(groups)
+    n_m, n_e, n_b = len(cls), len(erp_unmatched), len(bank_unmatched)
+    row = np.arange(n_m + n_e + n_b)
+    erp_index = np.concatenate([cls["erp_index"].to_numpy(), erp_unmatched, np.zeros(n_b, dtype=int)]).astype("int64")
+    bank_index = np.concatenate([cls["bank_index"].to_numpy(), np.zeros(n_e, dtype=int), bank_unmatched]).astype("int64")
+    results = pd.DataFrame({
+        "erp_index": pd.arrays.IntegerArray(erp_index, row >= n_m + n_e),
+        "bank_index": pd.arrays.IntegerArray(bank_index, (row >= n_m) & (row < n_m + n_e)),
+        "status": labels + ["Missing in Bank"] * n_e + ["Missing in ERP"] * n_b,
+        "amount_diff": pd.array(np.concatenate([pd.to_numeric(cls["amount_diff"], errors="coerce").to_numpy(dtype=float),
+                                                np.full(n_e + n_b, np.nan)]), dtype="Int64"),
+        "rationale": rationales + [["ERP record has no corresponding bank transaction after matching."] for _ in range(n_e)]
+                                + [["Bank transaction has no corresponding ERP record after matching."] for _ in range(n_b)],
+    })
+    return results
 
 @tool("classify_discrepancies")
-def classify_discrepancies(payload: Dict[str, Any]) -> Dict[str, Any]:
+@instrument("classify_discrepancies")
+def classify_discrepancies(payload: Dict[str, Any], processes: int = 1) -> Dict[str, Any]:
     """
     Classify discrepancies found during reconciliation between ERP and bank records.
 
+    Amount differences, the rounding tolerance and duplicate Invoice ID flags are
+    computed for all matched pairs at once, using one Invoice ID frequency table
+    per dataset; rationale strings are only built for the final labels. Members
+    of many-to-one split groups are labelled "Split payment", one row per link
+    ("Possible split payment" for groups matched by date only, see ``split_by_date``).
+
     Args:
         payload (Dict[str, Any]): A dictionary containing matched/unmatched records
                                   and discrepancy details.
+        processes (int, optional): Worker processes; pairs are classified in shards
+                                  with identical results. Defaults to 1 (serial).
 
     Returns:
         Dict[str, Any]: A structured classification of discrepancies
-                        (e.g., missing entries, mismatched values).
+                        (e.g., missing entries, mismatched values) as a ``frame``
+                        with erp_index, bank_index, status, amount_diff (integer cents)
+                        and rationale.
 
     Author:
         Dr. Ayushi Mandlik
     """
-    erp_df = pd.DataFrame(payload["erp"]["records"]).copy()
-    bank_df = pd.DataFrame(payload["bank"]["records"]).copy()
-    matches = payload["matches"]["matches"]
-    erp_unmatched = set(payload["matches"]["erp_unmatched"])
-    bank_unmatched = set(payload["matches"]["bank_unmatched"])
-
-    results, seen_pairs = [], set()
-    for m in matches:
-        e = erp_df.iloc[m["erp_index"]].to_dict()
-        b = bank_df.iloc[m["bank_index"]].to_dict()
-        key = (m["erp_index"], m["bank_index"])
-        if key in seen_pairs: continue
-        seen_pairs.add(key)
-        amt_e = e.get("Amount"); amt_b = b.get("Amount")
-        diff, label, rationale = None, "Matched", []
-        if amt_e is not None and amt_b is not None:
-            diff = round(abs(amt_e - amt_b), 2)
-            if diff == 0:
-                label = "Matched"; rationale.append("Exact amount match.")
-            elif diff <= 0.05:
-                label = "Rounding difference"; rationale.append(f"Amounts differ by {diff}, within rounding tolerance (≤ 0.05).")
-            else:
-                label = "Amount mismatch"; rationale.append(f"Amounts differ by {diff} (> 0.05).")
-        inv = (e.get("Invoice ID") or "").strip().upper()
-        dup_erp = (erp_df["Invoice ID"].astype(str).str.upper() == inv).sum() > 1 if inv and "Invoice ID" in erp_df else False
-        dup_bank = ("Invoice ID" in bank_df) and ((bank_df["Invoice ID"].astype(str).str.upper() == inv).sum() > 1) if inv else False
-        if dup_erp or dup_bank:
-            label = "Duplicate"; rationale.append("Invoice ID appears multiple times in one dataset.")
-        results.append({"erp_index": m["erp_index"], "bank_index": m["bank_index"], "status": label, "amount_diff": diff, "rationale": rationale})
-    for i in erp_unmatched:
-        results.append({"erp_index": i, "bank_index": None, "status": "Missing in Bank", "amount_diff": None, "rationale": ["ERP record has no corresponding bank transaction after matching."]})
-    for j in bank_unmatched:
-        results.append({"erp_index": None, "bank_index": j, "status": "Missing in ERP", "amount_diff": None, "rationale": ["Bank transaction has no corresponding ERP record after matching."]})
-    return {"results": results}
+    return {"frame": classify_frames(as_frame(payload["erp"]), as_frame(payload["bank"]), payload["matches"], processes=processes)}
@@ -1,35 +1,201 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+import csv
 import pdfplumber
 import pandas as pd
-from langchain.tools import tool
+from langchain_core.tools import tool
+from .metrics_tools import instrument
 from io import BytesIO
+from .table_tools import table
+from .layout_tools import TemplateRegistry, fingerprint, learn_template, read_with_template
+
+ERP_COLUMNS = ("Date", "Invoice ID", "Amount", "Status")
+# Bump when extraction output changes for the same input bytes (invalidates cached tables).
+PARSER_VERSION = "1"
+
+def _erp_format(file_bytes: bytes) -> str:
+    if file_bytes[:4] == b"PK\x03\x04": return "xlsx"
+    if file_bytes[:4] == b"\xd0\xcf\x11\xe0": return "xls"
+    if file_bytes[:4] == b"PAR1": return "parquet"
+    return "csv"
+
+def _csv_sep(file_bytes: bytes) -> str:
+    try:
+        return csv.Sniffer().sniff(file_bytes[:65536].decode("utf-8", "ignore"), delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+def _wanted(columns) -> List[Any]:
+    keep = [c for c in columns if str(c).strip() in ERP_COLUMNS]
+    return keep or list(columns)
+
+def _erp_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(c).strip() for c in df.columns]
+    if "Invoice ID" in df:
+        inv = df["Invoice ID"]
+        df["Invoice ID"] = inv.astype(object).where(inv.isna(), inv.astype(str))
+    return df
+
+def _iter_xlsx(file_bytes: bytes, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    import openpyxl
+    wb = openpyxl.load_workbook(BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [f"Unnamed: {i}" if h is None else h for i, h in enumerate(header)]
+        cols = _wanted(header)
+        pos = [header.index(c) for c in cols]
+        batch = []
+        for r in rows:
+            if r is None or all(v is None for v in r): continue
+            batch.append([r[i] if i < len(r) else None for i in pos])
+            if len(batch) >= chunk_rows:
+                yield _erp_chunk(pd.DataFrame(batch, columns=cols)); batch = []
+        if batch:
+            yield _erp_chunk(pd.DataFrame(batch, columns=cols))
+    finally:
+        wb.close()
+
+def iter_erp_chunks(file_bytes: bytes, chunk_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+    """ERP rows in chunks of ``chunk_rows``, limited to the reconciliation columns (Date, Invoice ID, Amount, Status)."""
+    fmt = _erp_format(file_bytes)
+    if fmt == "xlsx":
+        yield from _iter_xlsx(file_bytes, chunk_rows)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(BytesIO(file_bytes))
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=_wanted(pf.schema_arrow.names)):
+            yield _erp_chunk(batch.to_pandas())
+    elif fmt == "xls":
+        yield _erp_chunk(pd.read_excel(BytesIO(file_bytes), usecols=lambda c: str(c).strip() in ERP_COLUMNS, dtype={"Invoice ID": str}))
+    else:
+        sep = _csv_sep(file_bytes)
+        cols = _wanted(pd.read_csv(BytesIO(file_bytes), nrows=0, sep=sep).columns)
+        reader = pd.read_csv(BytesIO(file_bytes), usecols=cols, dtype=str, chunksize=chunk_rows, sep=sep)
+        for chunk in reader:
+            yield _erp_chunk(chunk)
 
 @tool("read_erp_excel", return_direct=False)
-def read_erp_excel(file_bytes: bytes) -> Dict[str, Any]:
+@instrument("read_erp_excel")
+def read_erp_excel(file_bytes: bytes, chunk_rows: int = 100_000) -> Dict[str, Any]:
     """
-    Parse ERP data from an uploaded Excel file.
+    Parse ERP data from an uploaded Excel, CSV or Parquet file.
+
+    The format is detected from the file's leading bytes. Only the columns
+    used for reconciliation are loaded, XLSX workbooks are streamed in
+    read-only mode and all formats are read in chunks of ``chunk_rows`` rows.
 
     Args:
-        file_bytes (bytes): Raw bytes of the uploaded Excel file.
+        file_bytes (bytes): Raw bytes of the uploaded ERP file.
+        chunk_rows (int, optional): Rows per read chunk. Defaults to 100000.
 
     Returns:
-        Dict[str, Any]: Parsed ERP data structured as records
+        Dict[str, Any]: Parsed ERP data as a columnar table (``frame``)
                         (e.g., transaction ID, date, amount).
 
     Author:
         Dr. Ayushi Mandlik
     """
-    df = pd.read_excel(BytesIO(file_bytes), dtype={"Invoice ID": str})
-    df.columns = [c.strip() for c in df.columns]
-    return {"columns": df.columns.tolist(), "records": df.to_dict(orient="records")}
+    chunks = list(iter_erp_chunks(file_bytes, chunk_rows))
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(ERP_COLUMNS))
+    return table(df)
+
+_WORKER_PDF = None
+_WORKER_TEMPLATE = None
+
+def _init_pdf_worker(file_bytes: bytes, template: Optional[Dict[str, Any]] = None):
+    global _WORKER_PDF, _WORKER_TEMPLATE
+    _WORKER_PDF = pdfplumber.open(BytesIO(file_bytes))
+    _WORKER_TEMPLATE = template
+
+def _table_rows(page) -> List[Dict[str, Any]]:
+    rows = []
+    for tbl in page.extract_tables() or []:
+        header = [h.strip() if isinstance(h, str) else "" for h in tbl[0]]
+        for r in tbl[1:]:
+            rows.append({header[i] if i < len(header) else f"col_{i}": r[i] for i in range(len(r))})
+    return rows
+
+def _extract_page_range(start: int, stop: int, pdf=None, template: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    if pdf is None:
+        pdf, template = _WORKER_PDF, _WORKER_TEMPLATE
+    rows = []
+    for page in pdf.pages[start:stop]:
+        page_rows = read_with_template(page, template) if template else None
+        rows.extend(_table_rows(page) if page_rows is None else page_rows)
+        page.flush_cache()
+    return rows
+
+def _resolve_template(pdf, template_dir: str) -> Optional[Dict[str, Any]]:
+    page = pdf.pages[0]
+    fp = fingerprint(page)
+    if fp is None:
+        return None
+    registry = TemplateRegistry(template_dir)
+    template = registry.get(fp)
+    if template is None:
+        template = learn_template(page, fp)
+        # Only keep a learned layout if bucketing reproduces table detection on its own page.
+        if template is None or read_with_template(page, template) != _table_rows(page):
+            return None
+        registry.put(template)
+    return template
+
+def _bank_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
+    rename_map = {}
+    for col in df.columns:
+        low = str(col).lower().strip()
+        if low == "date": rename_map[col] = "Date"
+        elif "description" in low: rename_map[col] = "Description"
+        elif "amount" in low: rename_map[col] = "Amount"
+        elif "ref" in low or low in {"id","ref id"}: rename_map[col] = "Ref ID"
+    return df.rename(columns=rename_map)
+
+def _iter_bank_rows(file_bytes: bytes, workers: int = 1, chunk_pages: int = 25, template_dir: str = "") -> Iterator[List[Dict[str, Any]]]:
+    """Raw table rows of the statement, one list per chunk of ``chunk_pages`` pages, in page order."""
+    with pdfplumber.open(BytesIO(file_bytes)) as pdf:
+        n_pages = len(pdf.pages)
+        template = _resolve_template(pdf, template_dir) if template_dir and n_pages else None
+        starts = list(range(0, n_pages, max(1, chunk_pages)))
+        stops = starts[1:] + [n_pages]
+        if workers <= 1 or n_pages <= chunk_pages:
+            for start, stop in zip(starts, stops):
+                yield _extract_page_range(start, stop, pdf, template)
+            return
+    with ProcessPoolExecutor(max_workers=min(workers, len(starts)), initializer=_init_pdf_worker, initargs=(file_bytes, template)) as pool:
+        yield from pool.map(_extract_page_range, starts, stops)
+
+def iter_bank_chunks(file_bytes: bytes, workers: int = 1, chunk_pages: int = 25, template_dir: str = "") -> Iterator[pd.DataFrame]:
+    """Bank statement rows as one frame per chunk of pages, with the standard column names."""
+    for rows in _iter_bank_rows(file_bytes, workers, chunk_pages, template_dir):
+        if rows:
+            yield _bank_frame(rows)
 
 @tool("read_bank_pdf", return_direct=False)
-def read_bank_pdf(file_bytes: bytes) -> Dict[str, Any]:
+@instrument("read_bank_pdf")
+def read_bank_pdf(file_bytes: bytes, workers: int = 1, chunk_pages: int = 25, template_dir: str = "") -> Dict[str, Any]:
     """
     Parse bank statement data from an uploaded PDF file.
 
+    With ``workers > 1`` the page range is split into chunks of ``chunk_pages``
+    pages and extracted across a process pool; every worker opens the same
+    bytes once and the per-chunk rows are merged back in page order.
+
+    With ``template_dir`` set, the statement layout is fingerprinted from the
+    first page and looked up in (or learned into) a template registry there;
+    pages are then read by bucketing words into the template's column
+    boundaries, falling back to full table detection for pages that don't fit.
+
     Args:
         file_bytes (bytes): Raw bytes of the uploaded PDF file.
+        workers (int, optional): Number of extraction processes. Defaults to 1 (serial).
+        chunk_pages (int, optional): Pages per work item when running in parallel.
+                                     Defaults to 25.
+        template_dir (str, optional): Directory of stored layout templates. Empty
+                                      disables the template fast path. Defaults to "".
 
     Returns:
         Dict[str, Any]: Parsed bank transactions extracted from the PDF.
@@ -38,21 +204,6 @@ def read_bank_pdf(file_bytes: bytes) -> Dict[str, Any]:
         Dr. Ayushi Mandlik
     """
     rows = []
-    with pdfplumber.open(BytesIO(file_bytes)) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()
-            for table in tables or []:
-                header = [h.strip() if isinstance(h, str) else "" for h in table[0]]
-                for r in table[1:]:
-                    row = {header[i] if i < len(header) else f"col_{i}": r[i] for i in range(len(r))}
-                    rows.append(row)
-    df = pd.DataFrame(rows)
-    rename_map = {}
-    for col in df.columns:
-        low = str(col).lower().strip()
-        if low == "date": rename_map[col] = "Date"
-        elif "description" in low: rename_map[col] = "Description"
-        elif "amount" in low: rename_map[col] = "Amount"
-        elif "ref" in low or low in {"id","ref id"}: rename_map[col] = "Ref ID"
-    df = df.rename(columns=rename_map)
-    return {"columns": df.columns.tolist(), "records": df.to_dict(orient="records")}
+    for chunk in _iter_bank_rows(file_bytes, workers, chunk_pages, template_dir):
+        rows.extend(chunk)
+    return table(_bank_frame(rows))
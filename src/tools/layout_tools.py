@@ -0,0 +1,98 @@
+from typing import Dict, Any, List, Optional
+from bisect import bisect_right
+import hashlib
+import json
+import os
+import uuid
+
+TEMPLATE_VERSION = 1
+REQUIRED_COLUMNS = ("date", "amount")
+_LINE_TOLERANCE = 3.0
+_X_TOLERANCE = 2.0
+
+def _lines(words: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    lines, current, top = [], [], None
+    for w in sorted(words, key=lambda w: (round(w["top"]), w["x0"])):
+        if top is not None and abs(w["top"] - top) > _LINE_TOLERANCE:
+            lines.append(current); current = []
+        if not current: top = w["top"]
+        current.append(w)
+    if current: lines.append(current)
+    return [sorted(line, key=lambda w: w["x0"]) for line in lines]
+
+def _line_text(line: List[Dict[str, Any]]) -> str:
+    return " ".join(w["text"] for w in line)
+
+def _is_header(line: List[Dict[str, Any]]) -> bool:
+    tokens = {w["text"].strip().lower() for w in line}
+    return all(col in tokens for col in REQUIRED_COLUMNS)
+
+def fingerprint(page) -> Optional[str]:
+    """Cheap layout key from the page size and the header line's words and x positions."""
+    for line in _lines(page.extract_words()):
+        if _is_header(line):
+            key = [round(page.width), round(page.height), [(w["text"].lower(), round(w["x0"] / 5) * 5) for w in line]]
+            return hashlib.sha1(json.dumps(key).encode()).hexdigest()[:16]
+    return None
+
+def learn_template(page, fp: str) -> Optional[Dict[str, Any]]:
+    """Column x-boundaries and header row of the first detected table on ``page``."""
+    tables = page.find_tables()
+    if not tables or not tables[0].rows:
+        return None
+    cells = tables[0].rows[0].cells
+    if any(c is None for c in cells):
+        return None
+    header = [h.strip() if isinstance(h, str) else "" for h in tables[0].extract()[0]]
+    return {"version": TEMPLATE_VERSION, "fingerprint": fp, "header": header,
+            "boundaries": [c[0] for c in cells[1:]], "x0": cells[0][0], "x1": cells[-1][2]}
+
+def read_with_template(page, template: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Rows of ``page`` bucketed into the template's columns by word position, or
+    None when the page doesn't fit the template (caller falls back to table detection).
+    """
+    header, bounds = template["header"], template["boundaries"]
+    required = [i for i, h in enumerate(header) if h.lower() in REQUIRED_COLUMNS]
+    header_text = " ".join(header).split()
+    lines = _lines(page.extract_words())
+    start = next((k + 1 for k, line in enumerate(lines) if [w["text"] for w in line] == header_text), None)
+    if start is None:
+        return None
+    rows = []
+    for line in lines[start:]:
+        if line[0]["x0"] < template["x0"] - _X_TOLERANCE or line[-1]["x1"] > template["x1"] + _X_TOLERANCE:
+            return None
+        cols = [[] for _ in header]
+        for w in line:
+            cols[bisect_right(bounds, (w["x0"] + w["x1"]) / 2)].append(w["text"])
+        row = [" ".join(c) for c in cols]
+        if any(not row[i] for i in required):
+            return None
+        rows.append({header[i]: row[i] for i in range(len(row))})
+    return rows
+
+class TemplateRegistry:
+    """Statement layout templates persisted as JSON files, one per fingerprint."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, fp: str) -> str:
+        return os.path.join(self.root, f"{fp}.json")
+
+    def get(self, fp: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(fp)) as f:
+                template = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return template if template.get("version") == TEMPLATE_VERSION else None
+
+    def put(self, template: Dict[str, Any]) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(template["fingerprint"])
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(template, f)
+        os.replace(tmp, path)
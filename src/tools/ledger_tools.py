@@ -0,0 +1,114 @@
+from typing import Optional, Tuple
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from .normalize_tools import NORMALIZER_VERSION
+from .table_tools import compact
+
+# Pair statuses that close both rows for good; everything else stays open and is re-matched next run.
+CLOSED_STATUSES = ("Matched", "Rounding difference", "Split payment")
+_FP = "_fp"
+
+def row_fingerprints(df: pd.DataFrame) -> np.ndarray:
+    """
+    Stable per-row keys: a hash of the normalized values plus the row's occurrence
+    number among identical rows, so repeated identical rows stay distinct.
+    """
+    if df.empty:
+        return np.empty(0, dtype=object)
+    h = pd.util.hash_pandas_object(df, index=False)
+    n = h.groupby(h.to_numpy(), sort=False).cumcount()
+    return np.array([f"{a:016x}-{b}" for a, b in zip(h.to_numpy(), n.to_numpy())], dtype=object)
+
+class Ledger:
+    """
+    Persisted reconciliation state: open ERP/bank rows (normalized, keyed by row
+    fingerprint), fingerprints of closed rows, and the last status reported per
+    open item. Each save writes a new state directory and then atomically swaps
+    the ``CURRENT`` pointer, so a crashed run leaves the previous state intact.
+    Runs sharing one ledger directory must not overlap.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.erp_open = pd.DataFrame({_FP: pd.Series(dtype=object)})
+        self.bank_open = pd.DataFrame({_FP: pd.Series(dtype=object)})
+        self.closed = pd.DataFrame({"side": pd.Series(dtype=object), _FP: pd.Series(dtype=object)})
+        self.statuses = pd.DataFrame({"erp_fp": pd.Series(dtype=object), "bank_fp": pd.Series(dtype=object), "status": pd.Series(dtype=object)})
+
+    @classmethod
+    def load(cls, root: str) -> "Ledger":
+        ledger = cls(root)
+        state = ledger._current()
+        if state:
+            with open(os.path.join(state, "VERSION")) as f:
+                version = f.read().strip()
+            if version != NORMALIZER_VERSION:
+                raise ValueError(f"Ledger {root!r} holds rows normalized by version {version}, not {NORMALIZER_VERSION}; rebuild it")
+            for name in ("erp_open", "bank_open", "closed", "statuses"):
+                setattr(ledger, name, compact(pd.read_parquet(os.path.join(state, f"{name}.parquet"))))
+        return ledger
+
+    def _current(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, "CURRENT")) as f:
+                return os.path.join(self.root, f.read().strip())
+        except OSError:
+            return None
+
+    def working_set(self, side: str, df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray, int]:
+        """
+        Still-open rows of ``side`` followed by the rows of ``df`` the ledger has not
+        seen yet. Returns the frame, its fingerprints and the number of new rows.
+        """
+        fp = row_fingerprints(df)
+        open_df = self.erp_open if side == "erp" else self.bank_open
+        known = set(open_df[_FP]) | set(self.closed.loc[self.closed["side"] == side, _FP])
+        new = np.array([f not in known for f in fp], dtype=bool)
+        parts = [part for part in (open_df.drop(columns=_FP), df.loc[new]) if len(part)]
+        work = compact(pd.concat(parts, ignore_index=True)) if len(parts) > 1 else (parts or [df.iloc[:0]])[0].reset_index(drop=True)
+        return work, np.concatenate([open_df[_FP].to_numpy(dtype=object), fp[new]]), int(new.sum())
+
+    def update(self, erp: pd.DataFrame, erp_fp: np.ndarray, bank: pd.DataFrame, bank_fp: np.ndarray, results: pd.DataFrame) -> np.ndarray:
+        """
+        Fold a classification of the working sets into the ledger and return a mask
+        of the ``results`` rows whose status is new or differs from the last run.
+        """
+        e, b = results["erp_index"], results["bank_index"]
+        keys = pd.DataFrame({
+            "erp_fp": np.where(e.isna(), "", erp_fp[e.fillna(0).to_numpy(dtype=int)] if len(erp_fp) else ""),
+            "bank_fp": np.where(b.isna(), "", bank_fp[b.fillna(0).to_numpy(dtype=int)] if len(bank_fp) else ""),
+            "status": results["status"].to_numpy(dtype=object),
+        })
+        prev = pd.MultiIndex.from_frame(self.statuses)
+        changed = ~pd.MultiIndex.from_frame(keys).isin(prev)
+
+        closed = keys["status"].isin(CLOSED_STATUSES).to_numpy()
+        erp_closed = np.zeros(len(erp), dtype=bool); erp_closed[e[closed].to_numpy(dtype=int)] = True
+        bank_closed = np.zeros(len(bank), dtype=bool); bank_closed[b[closed].to_numpy(dtype=int)] = True
+        self.erp_open = erp.loc[~erp_closed].assign(**{_FP: erp_fp[~erp_closed]}).reset_index(drop=True)
+        self.bank_open = bank.loc[~bank_closed].assign(**{_FP: bank_fp[~bank_closed]}).reset_index(drop=True)
+        closed_now = pd.DataFrame({"side": ["erp"] * int(erp_closed.sum()) + ["bank"] * int(bank_closed.sum()),
+                                   _FP: np.concatenate([erp_fp[erp_closed], bank_fp[bank_closed]])})
+        if len(closed_now):
+            self.closed = pd.concat([self.closed, closed_now], ignore_index=True) if len(self.closed) else closed_now
+        self.statuses = keys.loc[~closed].reset_index(drop=True)
+        return changed
+
+    def save(self, run_id: str) -> str:
+        state = f"state-{run_id}"
+        path = os.path.join(self.root, state)
+        os.makedirs(path, exist_ok=True)
+        for name in ("erp_open", "bank_open", "closed", "statuses"):
+            getattr(self, name).to_parquet(os.path.join(path, f"{name}.parquet"), index=False)
+        with open(os.path.join(path, "VERSION"), "w") as f:
+            f.write(NORMALIZER_VERSION)
+        old = self._current()
+        tmp = os.path.join(self.root, f"CURRENT.{run_id}.tmp")
+        with open(tmp, "w") as f:
+            f.write(state)
+        os.replace(tmp, os.path.join(self.root, "CURRENT"))
+        if old and old != path:
+            shutil.rmtree(old, ignore_errors=True)
+        return path
@@ -1,15 +1,24 @@
-from typing import List, Dict, Any
-from langchain.tools import tool
+from typing import Dict, Any, Deque
+from collections import deque
+from datetime import datetime, timezone
+from langchain_core.tools import tool
+from .run_context import current_run, DEFAULT_LOG_LIMIT
 
-GLOBAL_LOG: List[Dict[str, Any]] = []
+# Only used for entries logged outside of a run context; runs keep their own buffer.
+GLOBAL_LOG: Deque[Dict[str, Any]] = deque(maxlen=DEFAULT_LOG_LIMIT)
+
+def _buffer() -> Deque[Dict[str, Any]]:
+    run = current_run()
+    return run.log if run is not None else GLOBAL_LOG
 
 @tool("append_log")
 #def append_log(entry: Dict[str, Any]) -> str:
 def append_log(agent: str, action: str, message: str) -> str:
     """
-    Append a log entry to the reconciliation log file.
+    Append a log entry to the current run's reconciliation log.
     """
-    GLOBAL_LOG.append({
+    _buffer().append({
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
         "agent": agent,
         "action": action,
         "message": message
@@ -19,7 +28,7 @@ def append_log(agent: str, action: str, message: str) -> str:
 @tool("get_logs")
 def get_logs(_=None) -> Dict[str, Any]:
     """
-    Retrieve all stored reconciliation log entries.
+    Retrieve the stored reconciliation log entries of the current run.
 
     Args:
         _ (Any): Placeholder argument (not used).
@@ -31,4 +40,5 @@ def get_logs(_=None) -> Dict[str, Any]:
         Dr. Ayushi Mandlik
     """
 
-    return {"logs": GLOBAL_LOG}
+    run = current_run()
+    return {"run_id": run.run_id if run else None, "logs": list(_buffer())}
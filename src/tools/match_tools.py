@@ -1,54 +1,423 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+import heapq
+import threading
+import numpy as np
 import pandas as pd
-from langchain.tools import tool
-from rapidfuzz import fuzz
-
-def _match_row(erp_row, bank_df):
-    inv = str(erp_row.get("Invoice ID") or "").strip().upper()
-    amt = erp_row.get("Amount")
-    candidates = bank_df.copy()
-    if "Invoice ID" in candidates.columns and inv:
-        candidates = candidates[candidates["Invoice ID"] == inv]
-    if amt is not None and "Amount" in candidates.columns:
-        candidates["amt_diff"] = (candidates["Amount"] - amt).abs()
-        candidates = candidates.sort_values("amt_diff")
-    if "Description" in candidates.columns and inv:
-        candidates["desc_score"] = candidates["Description"].astype(str).apply(lambda s: fuzz.partial_ratio(s.upper(), inv))
-        candidates = candidates.sort_values(["amt_diff","desc_score"], ascending=[True, False])
-    if len(candidates) == 0:
-        return None, None
-    best = candidates.iloc[0].to_dict()
-    amt_diff = abs((best.get("Amount") or 0) - (amt or 0))
-    score = int(best.get("desc_score", 0)) - (amt_diff * 10)
-    return best, score
+from langchain_core.tools import tool
+from .metrics_tools import instrument
+from rapidfuzz import fuzz, process
+from .table_tools import as_frame, cents, days, keys
+from .split_tools import find_splits
+from .shard_tools import SharedColumns, init_worker, worker_columns
+
+STRATEGIES = ("greedy", "erp_order")
+SIDES = ("erp", "bank")
+CANDIDATE_COLUMNS = ("erp_index", "bank_index", "rank", "same_invoice", "amount_diff", "desc_score", "date_gap", "score")
+
+class _BankIndex:
+    """Invoice ID hash index and amount-sorted index over the bank side, built once per run."""
+
+    def __init__(self, bank_df: pd.DataFrame):
+        self.n = len(bank_df)
+        self.has_inv = "Invoice ID" in bank_df.columns
+        self.amount = cents(bank_df)
+        if "Description" in bank_df.columns:
+            self.desc = np.array([str(s).upper() for s in bank_df["Description"]], dtype=object)
+        else:
+            self.desc = None
+        self.inv = bank_df["Invoice ID"] if self.has_inv else None
+        valid = np.flatnonzero(~np.isnan(self.amount))
+        order = np.argsort(self.amount[valid], kind="stable")
+        self.amount_order = valid[order]
+        self.amount_sorted = self.amount[self.amount_order]
+
+    @cached_property
+    def by_inv(self) -> Dict[str, np.ndarray]:
+        if not self.has_inv:
+            return {}
+        keys = self.inv[self.inv.notna()]
+        rows = keys.index.to_numpy()
+        return {k: rows[v] for k, v in keys.groupby(keys, sort=False, observed=True).indices.items()}
+
+    def invoice_candidates(self, erp_pos: np.ndarray, erp_inv: np.ndarray):
+        e_parts, b_parts = [], []
+        for i, inv in zip(erp_pos, erp_inv):
+            hits = self.by_inv.get(inv)
+            if hits is not None:
+                e_parts.append(np.full(len(hits), i)); b_parts.append(hits)
+        if not e_parts:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        return np.concatenate(e_parts), np.concatenate(b_parts)
+
+    def amount_candidates(self, erp_pos: np.ndarray, erp_amt: np.ndarray, neighbors: int):
+        m = len(self.amount_sorted)
+        if m == 0 or len(erp_pos) == 0:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        ok = ~np.isnan(erp_amt)
+        erp_pos, erp_amt = erp_pos[ok], erp_amt[ok]
+        at = np.searchsorted(self.amount_sorted, erp_amt)
+        offsets = np.arange(-neighbors, neighbors)
+        slots = at[:, None] + offsets[None, :]
+        keep = (slots >= 0) & (slots < m)
+        e = np.broadcast_to(erp_pos[:, None], slots.shape)[keep]
+        return e, self.amount_order[slots[keep]]
+
+def _window_candidates(erp_pos: np.ndarray, erp_amt: np.ndarray, erp_day: np.ndarray,
+                       bank_pos: np.ndarray, bank_amt: np.ndarray, bank_day: np.ndarray, tolerance: int, window: int):
+    """All (erp, bank) pairs within ``tolerance`` cents and ``window`` days, via a sorted range join on amount."""
+    ok_e = ~np.isnan(erp_amt) & ~np.isnan(erp_day)
+    ok_b = ~np.isnan(bank_amt) & ~np.isnan(bank_day)
+    erp_pos, erp_amt, erp_day = erp_pos[ok_e], erp_amt[ok_e], erp_day[ok_e]
+    bank_pos, bank_amt, bank_day = bank_pos[ok_b], bank_amt[ok_b], bank_day[ok_b]
+    order = np.argsort(bank_amt, kind="stable")
+    sorted_amt = bank_amt[order]
+    lo = np.searchsorted(sorted_amt, erp_amt - tolerance, side="left")
+    hi = np.searchsorted(sorted_amt, erp_amt + tolerance, side="right")
+    counts = hi - lo
+    slot = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    ei, bi = np.repeat(np.arange(len(erp_pos)), counts), order[slot]
+    near = np.abs(erp_day[ei] - bank_day[bi]) <= window
+    return erp_pos[ei[near]], bank_pos[bi[near]]
+
+def _key_join(erp_pos: np.ndarray, erp_key: np.ndarray, bank_pos: np.ndarray, bank_key: np.ndarray):
+    """All (erp, bank) pairs with equal integer keys, via a sorted join."""
+    order = np.argsort(bank_key, kind="stable")
+    sorted_key = bank_key[order]
+    lo = np.searchsorted(sorted_key, erp_key, side="left")
+    counts = np.searchsorted(sorted_key, erp_key, side="right") - lo
+    slot = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    return np.repeat(erp_pos, counts), bank_pos[order[slot]]
+
+def _invoice_shard(shard: int, shards: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Invoice-tier candidates and description scores for the keys ``k`` with ``k % shards == shard`` (pool task)."""
+    cols = worker_columns()
+    erp_key, bank_key = cols["erp_key"], cols["bank_key"]
+    e = np.flatnonzero((erp_key >= 0) & (erp_key % shards == shard))
+    b = np.flatnonzero((bank_key >= 0) & (bank_key % shards == shard))
+    e, b = _key_join(e, erp_key[e], b, bank_key[b])
+    score = np.zeros(len(e))
+    if "desc" in cols.columns and len(e):
+        names, desc = cols["names"], cols["desc"]
+        score[:] = [fuzz.partial_ratio(desc[j], names[k]) for j, k in zip(b, erp_key[e])]
+    return e, b, score
+
+def _sharded_invoice_candidates(erp_inv: np.ndarray, index: _BankIndex, processes: int):
+    """
+    The invoice tier of ``_match_frames`` on a process pool: rows are sharded by a
+    hash of their Invoice ID (so every candidate pair lies in one shard), the key
+    codes and descriptions go to the workers through shared memory and shard
+    results are concatenated in shard order.
+    """
+    bank_inv = np.full(index.n, "", dtype=object)
+    if index.has_inv:
+        known = index.inv.notna().to_numpy()
+        bank_inv[known] = index.inv[known].astype(str).to_numpy(dtype=object)
+    all_inv = np.concatenate([erp_inv, bank_inv])
+    codes, names = pd.factorize(all_inv)
+    codes[all_inv == ""] = -1
+    strings = {"names": names.astype(str)}
+    if index.desc is not None:
+        strings["desc"] = index.desc
+    arrays = {"erp_key": codes[:len(erp_inv)].astype(np.int64), "bank_key": codes[len(erp_inv):].astype(np.int64)}
+    with SharedColumns.create(arrays, strings) as shared, \
+            ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(shared.spec,)) as pool:
+        parts = list(pool.map(_invoice_shard, range(processes), [processes] * processes))
+    if not parts:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.zeros(0)
+    return tuple(np.concatenate(p) for p in zip(*parts))
+
+def _assign(e: np.ndarray, b: np.ndarray, amt_diff: np.ndarray, desc_score: np.ndarray, strategy: str, date_dist: np.ndarray = None):
+    sort_diff = np.where(np.isnan(amt_diff), np.inf, amt_diff)
+    date_dist = np.zeros(len(e)) if date_dist is None else date_dist
+    if strategy == "greedy":
+        order = np.lexsort((b, e, date_dist, -desc_score, sort_diff))
+    else:
+        order = np.lexsort((b, date_dist, -desc_score, sort_diff, e))
+    used_erp, used_bank, picked = set(), set(), []
+    for k in order:
+        i, j = e[k], b[k]
+        if i in used_erp or j in used_bank: continue
+        used_erp.add(i); used_bank.add(j); picked.append(k)
+    return np.array(picked, dtype=int)
+
+def _match_frames(erp_df: pd.DataFrame, bank_df: pd.DataFrame, strategy: str = "greedy", amount_neighbors: int = 3,
+                  fallback: bool = True, amount_tolerance: float = 0.05, date_window_days: int = 3, workers: int = 1,
+                  splits: bool = True, split_window_days: int = 30, split_max_candidates: int = 20, split_max_items: int = 5,
+                  split_time_budget_ms: int = 50, split_by_date: bool = False, split_max_searches: int = 10_000,
+                  processes: int = 1) -> Dict[str, Any]:
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown matching strategy {strategy!r}; expected one of {STRATEGIES}")
+    erp_df = erp_df.reset_index(drop=True)
+    bank_df = bank_df.reset_index(drop=True)
+    index = _BankIndex(bank_df)
+    erp_inv = keys(erp_df)
+    erp_amt = cents(erp_df)
+    erp_day, bank_day = days(erp_df), days(bank_df)
+    tolerance = round(amount_tolerance * 100)
+    pos = np.arange(len(erp_df))
+
+    by_inv = (erp_inv != "") & index.has_inv
+    if processes > 1:
+        e1, b1, score1 = _sharded_invoice_candidates(erp_inv, index, processes)
+    else:
+        e1, b1 = index.invoice_candidates(pos[by_inv], erp_inv[by_inv])
+        score1 = np.zeros(len(e1))
+        if index.desc is not None and len(e1):
+            score1[:] = [fuzz.partial_ratio(d, k) for d, k in zip(index.desc[b1], erp_inv[e1])]
+    e2, b2 = index.amount_candidates(pos[~by_inv], erp_amt[~by_inv], amount_neighbors)
+    e, b = np.concatenate([e1, e2]), np.concatenate([b1, b2])
+    amt_diff = np.abs(index.amount[b] - erp_amt[e])
+    # Candidate pairs are unique and _assign orders them by value, so shard order doesn't change the result.
+    desc_score = np.concatenate([score1, np.zeros(len(e2))])
+
+    picked = _assign(e, b, amt_diff, desc_score, strategy)
+    e, b, amt_diff, desc_score = e[picked], b[picked], amt_diff[picked], desc_score[picked]
+    erp_used = np.zeros(len(erp_df), dtype=bool); erp_used[e] = True
+    bank_used = np.zeros(len(bank_df), dtype=bool); bank_used[b] = True
+
+    if fallback and index.desc is not None:
+        # Fallback tier: unreferenced bank rows against leftover ERP rows, blocked by amount and date window.
+        unref = bank_df["Invoice ID"].isna().to_numpy() if index.has_inv else np.ones(len(bank_df), dtype=bool)
+        e_free, b_free = np.flatnonzero(~erp_used), np.flatnonzero(~bank_used & unref)
+        e3, b3 = _window_candidates(e_free, erp_amt[e_free], erp_day[e_free], b_free, index.amount[b_free], bank_day[b_free],
+                                    tolerance, date_window_days)
+        if len(e3):
+            diff3 = np.abs(index.amount[b3] - erp_amt[e3])
+            score3 = process.cpdist(erp_inv[e3], index.desc[b3], scorer=fuzz.partial_ratio, workers=workers).astype(float)
+            took = _assign(e3, b3, diff3, score3, strategy, np.abs(erp_day[e3] - bank_day[b3]))
+            e, b = np.concatenate([e, e3[took]]), np.concatenate([b, b3[took]])
+            amt_diff, desc_score = np.concatenate([amt_diff, diff3[took]]), np.concatenate([desc_score, score3[took]])
+            erp_used[e3[took]] = True; bank_used[b3[took]] = True
+
+    groups = pd.DataFrame({"group": pd.Series(dtype=int), "erp_index": pd.Series(dtype=int), "bank_index": pd.Series(dtype=int),
+                           "by_date": pd.Series(dtype=bool)})
+    if splits:
+        # Split tier: leftovers plus pairs whose amounts disagree may combine into many-to-one groups.
+        loose = ~(amt_diff <= tolerance)
+        erp_free, bank_free = ~erp_used, ~bank_used
+        erp_free[e[loose]] = True; bank_free[b[loose]] = True
+        groups = find_splits(erp_df, bank_df, erp_day, bank_day, erp_free, bank_free, window_days=split_window_days,
+                             max_candidates=split_max_candidates, max_items=split_max_items, time_budget_ms=split_time_budget_ms,
+                             by_date=split_by_date, max_searches=split_max_searches)
+        if len(groups):
+            keep = ~(np.isin(e, groups["erp_index"]) | np.isin(b, groups["bank_index"]))
+            e, b, amt_diff, desc_score = e[keep], b[keep], amt_diff[keep], desc_score[keep]
+            erp_used[:] = False; erp_used[e] = True; erp_used[groups["erp_index"]] = True
+            bank_used[:] = False; bank_used[b] = True; bank_used[groups["bank_index"]] = True
+
+    order = np.argsort(e, kind="stable")
+    scores = desc_score[order].astype(int) - np.nan_to_num(amt_diff[order]) / 10
+    matches = pd.DataFrame({"erp_index": e[order], "bank_index": b[order], "score": scores.astype(float)})
+    return {"matches": matches, "groups": groups, "erp_unmatched": np.flatnonzero(~erp_used), "bank_unmatched": np.flatnonzero(~bank_used)}
+
+class _SideIndex:
+    """Invoice ID key index and amount-sorted index over one side, for candidate queries."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.amount, self.day, self.key = cents(df), days(df), keys(df)
+        self.desc = np.array([str(s).upper() for s in df["Description"]], dtype=object) if "Description" in df.columns else None
+        valid = np.flatnonzero(~np.isnan(self.amount))
+        self.amount_order = valid[np.argsort(self.amount[valid], kind="stable")]
+        self.amount_sorted = self.amount[self.amount_order]
+        codes, uniques = pd.factorize(self.key)
+        order = np.argsort(codes, kind="stable")
+        groups = np.split(order, np.cumsum(np.bincount(codes[order], minlength=len(uniques)))[:-1]) if len(uniques) else []
+        self.by_key = {k: rows for k, rows in zip(uniques, groups) if k != ""}
+
+    def nearest_amounts(self, amount: float, k: int) -> np.ndarray:
+        """Rows among the ``k`` closest amounts to ``amount``, plus every row tied with the k-th."""
+        m = len(self.amount_sorted)
+        if np.isnan(amount) or m == 0 or k <= 0:
+            return np.empty(0, dtype=int)
+        at = np.searchsorted(self.amount_sorted, amount)
+        near = np.abs(self.amount_sorted[max(0, at - k):at + k] - amount)
+        reach = np.partition(near, k - 1)[k - 1] if len(near) >= k else near.max()
+        lo = np.searchsorted(self.amount_sorted, amount - reach, side="left")
+        return self.amount_order[lo:np.searchsorted(self.amount_sorted, amount + reach, side="right")]
+
+class CandidateIndex:
+    """
+    Precomputed indexes over a normalized ERP/bank pair for reviewer queries:
+    the K best candidates on the other side for any row, with the score
+    components the matcher ranks by.
+
+    Candidates are the rows sharing the query row's Invoice ID plus its nearest
+    amounts (binary search on the amount-sorted index); only those are scored
+    and the best K are picked with a heap, so a query costs O(log n + c log K)
+    for c candidates however large the frames are. Build it once per run.
+    """
+
+    def __init__(self, erp_df: pd.DataFrame, bank_df: pd.DataFrame):
+        self.sides = {"erp": _SideIndex(erp_df.reset_index(drop=True)), "bank": _SideIndex(bank_df.reset_index(drop=True))}
+
+    def candidates(self, row: int, side: str = "erp", k: int = 5) -> pd.DataFrame:
+        """
+        The ``k`` best candidates for ``row`` of ``side`` ("erp" or "bank") on the
+        other side, best first: same Invoice ID first (as the matcher prefers them),
+        then smallest amount difference, highest description score, smallest date
+        gap and row order.
+        """
+        if side not in SIDES:
+            raise ValueError(f"Unknown side {side!r}; expected one of {SIDES}")
+        this, other = self.sides[side], self.sides["bank" if side == "erp" else "erp"]
+        if not 0 <= row < len(this.amount):
+            raise ValueError(f"Row {row} is out of range for the {side} side ({len(this.amount)} rows)")
+        key, amount, day = this.key[row], this.amount[row], this.day[row]
+        same = other.by_key.get(key, np.empty(0, dtype=int)) if key else np.empty(0, dtype=int)
+        rows = np.union1d(same, other.nearest_amounts(amount, k)).astype(int)
+        same_inv = np.isin(rows, same)
+        amt_diff = np.abs(other.amount[rows] - amount)
+        date_gap = np.abs(other.day[rows] - day)
+        bank_desc, erp_key = (other.desc, key) if side == "erp" else (this.desc, other.key[rows])
+        desc_score = np.zeros(len(rows))
+        if bank_desc is not None:
+            descs = bank_desc[rows] if side == "erp" else np.full(len(rows), bank_desc[row], dtype=object)
+            erp_keys = np.full(len(rows), erp_key, dtype=object) if side == "erp" else erp_key
+            desc_score[:] = [fuzz.partial_ratio(d, e) if e else 0 for d, e in zip(descs, erp_keys)]
+        sort_diff, sort_gap = np.where(np.isnan(amt_diff), np.inf, amt_diff), np.where(np.isnan(date_gap), np.inf, date_gap)
+        ranked = heapq.nsmallest(k, zip(~same_inv, sort_diff, -desc_score, sort_gap, rows, range(len(rows))))
+        picked = np.array([c[-1] for c in ranked], dtype=int)
+        query = np.full(len(picked), row)
+        erp_index, bank_index = (query, rows[picked]) if side == "erp" else (rows[picked], query)
+        return pd.DataFrame({"erp_index": erp_index, "bank_index": bank_index, "rank": np.arange(1, len(picked) + 1),
+                             "same_invoice": same_inv[picked], "amount_diff": amt_diff[picked] / 100,
+                             "desc_score": desc_score[picked], "date_gap": date_gap[picked],
+                             "score": desc_score[picked] - np.nan_to_num(amt_diff[picked]) / 10})
+
+    def top_k(self, rows: Iterable[int], side: str = "erp", k: int = 5) -> pd.DataFrame:
+        """``candidates`` for several rows, stacked in query order."""
+        parts = [self.candidates(int(r), side, k) for r in rows]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=list(CANDIDATE_COLUMNS))
 
 @tool("match_records")
-def match_records(payload: Dict[str, Any]) -> Dict[str, Any]:
+@instrument("match_records")
+def match_records(payload: Dict[str, Any], strategy: str = "greedy", amount_neighbors: int = 3, fallback: bool = True,
+                  amount_tolerance: float = 0.05, date_window_days: int = 3, workers: int = 1, splits: bool = True,
+                  split_window_days: int = 30, split_max_candidates: int = 20, split_max_items: int = 5,
+                  split_time_budget_ms: int = 50, split_by_date: bool = False, split_max_searches: int = 10_000,
+                  processes: int = 1) -> Dict[str, Any]:
     """
     Match ERP records with bank statement records to identify aligned
     and mismatched entries.
 
+    Bank rows are indexed once (Invoice ID hash index plus an amount-sorted
+    index), candidate pairs are generated in bulk from those indexes and
+    then assigned so that every bank row is used at most once. Bank rows
+    without an invoice reference that are still free are then offered to the
+    leftover ERP rows in a fallback tier: candidates are blocked by amount
+    tolerance and date window with a sorted range join, and only those pairs
+    are scored (in one batch) against the description. Finally a split tier
+    looks for many-to-one groups (a bank line settling several invoices, or an
+    invoice paid in instalments) among the leftovers and the pairs whose
+    amounts disagree, with an exact subset-sum search on integer cents.
+
+    Args:
+        payload (Dict[str, Any]): A dictionary containing normalized ERP
+                                  and bank records.
+        strategy (str, optional): "greedy" assigns the globally best pairs first
+                                  (smallest amount difference, then highest description
+                                  score, ties broken by row order); "erp_order" lets ERP
+                                  rows pick their best free candidate in file order.
+                                  Defaults to "greedy".
+        amount_neighbors (int, optional): For ERP rows without an Invoice ID, how many
+                                  bank rows on each side of the closest amount are
+                                  considered. Defaults to 3.
+        fallback (bool, optional): Run the amount/date-window tier for unreferenced bank
+                                  rows. Defaults to True.
+        amount_tolerance (float, optional): Largest amount difference accepted by the
+                                  fallback tier. Defaults to 0.05.
+        date_window_days (int, optional): Largest date difference, in days, accepted by
+                                  the fallback tier. Defaults to 3.
+        workers (int, optional): Threads used to score fallback candidates (-1 uses all
+                                  cores). Defaults to 1.
+        splits (bool, optional): Run the many-to-one split tier. Defaults to True.
+        split_window_days (int, optional): Largest date difference between a split
+                                  group's members and its target. Defaults to 30.
+        split_max_candidates (int, optional): Candidates searched per group (closest in
+                                  date first). Defaults to 20.
+        split_max_items (int, optional): Most rows combined into one group. Defaults to 5.
+        split_time_budget_ms (int, optional): Search time allowed per group. Defaults to 50.
+        split_max_searches (int, optional): Subset-sum searches allowed for the whole split
+                                  tier; when they run out the groups found so far are kept.
+                                  Defaults to 10000.
+        split_by_date (bool, optional): Also group bank rows that reference no invoice
+                                  with ERP rows close in date; such groups are flagged
+                                  ``by_date`` (lower confidence). Defaults to False.
+        processes (int, optional): Worker processes for the invoice tier; rows are sharded
+                                  by Invoice ID hash and the result is identical to the
+                                  serial run. Defaults to 1 (serial).
+
+    Returns:
+        Dict[str, Any]: A mapping of matched, unmatched, and partially matched records:
+                        ``matches`` is a frame of (erp_index, bank_index, score),
+                        ``groups`` a frame of (group, erp_index, bank_index, by_date) split-payment
+                        links and the unmatched entries are arrays of row positions.
+
+    Author:
+        Dr. Ayushi Mandlik
+    """
+    erp_df = as_frame(payload["erp"])
+    bank_df = as_frame(payload["bank"])
+    return _match_frames(erp_df, bank_df, strategy=strategy, amount_neighbors=amount_neighbors, fallback=fallback,
+                         amount_tolerance=amount_tolerance, date_window_days=date_window_days, workers=workers, splits=splits,
+                         split_window_days=split_window_days, split_max_candidates=split_max_candidates,
+                         split_max_items=split_max_items, split_time_budget_ms=split_time_budget_ms,
+                         split_by_date=split_by_date, split_max_searches=split_max_searches, processes=processes)
+
+_INDEX_CACHE_SIZE = 2
+_INDEXES: Dict[Tuple[int, int], Tuple[pd.DataFrame, pd.DataFrame, CandidateIndex]] = {}
+_INDEXES_LOCK = threading.Lock()
+
+def _candidate_index(erp_df: pd.DataFrame, bank_df: pd.DataFrame) -> CandidateIndex:
+    """
+    ``CandidateIndex`` of this frame pair, reused while the same frame objects are
+    queried (stage payloads are never modified in place). The last
+    ``_INDEX_CACHE_SIZE`` pairs are kept, together with their frames so that
+    their ids stay theirs.
+    """
+    key = (id(erp_df), id(bank_df))
+    with _INDEXES_LOCK:
+        hit = _INDEXES.pop(key, None)
+        if hit is not None:
+            _INDEXES[key] = hit
+            return hit[2]
+    index = CandidateIndex(erp_df, bank_df)
+    with _INDEXES_LOCK:
+        _INDEXES[key] = (erp_df, bank_df, index)
+        while len(_INDEXES) > _INDEX_CACHE_SIZE:
+            _INDEXES.pop(next(iter(_INDEXES)))
+    return index
+
+@tool("match_candidates")
+@instrument("match_candidates")
+def match_candidates(payload: Dict[str, Any], rows: list, side: str = "erp", k: int = 5) -> Dict[str, Any]:
+    """
+    Retrieve the best K candidate counterparts of given rows, e.g. to show a
+    reviewer the runner-ups of a disputed match.
+
+    Both sides are indexed on the first call for a payload (Invoice ID key index
+    plus an amount-sorted index) and the index is reused by later calls on the
+    same frames; for each row only the same-invoice rows and the nearest amounts
+    are scored and the best K are kept with a heap.
+
     Args:
         payload (Dict[str, Any]): A dictionary containing normalized ERP
                                   and bank records.
+        rows (list): Row positions to look up on ``side``.
+        side (str, optional): "erp" returns bank candidates for ERP rows, "bank"
+                              returns ERP candidates for bank rows. Defaults to "erp".
+        k (int, optional): Candidates returned per row. Defaults to 5.
 
     Returns:
-        Dict[str, Any]: A mapping of matched, unmatched, and partially matched records.
+        Dict[str, Any]: ``candidates``, a frame of (erp_index, bank_index, rank,
+                        same_invoice, amount_diff, desc_score, date_gap, score), best
+                        first for each queried row; ``score`` is on the scale of
+                        ``match_records`` scores.
 
     Author:
         Dr. Ayushi Mandlik
     """
-    erp_df = pd.DataFrame(payload["erp"]["records"])
-    bank_df = pd.DataFrame(payload["bank"]["records"])
-    matches, used_bank_idx = [], set()
-    for i, erp_row in erp_df.iterrows():
-        best, score = _match_row(erp_row, bank_df)
-        if best is None: continue
-        idx = bank_df.index[(bank_df["Date"]==best.get("Date")) & (bank_df["Amount"]==best.get("Amount"))].tolist()
-        idx = idx[0] if idx else None
-        if idx is not None and idx not in used_bank_idx:
-            used_bank_idx.add(idx)
-            matches.append({"erp_index": int(i), "bank_index": int(idx), "score": float(score), "bank_row": best})
-    erp_unmatched = [int(i) for i in range(len(erp_df)) if i not in [m["erp_index"] for m in matches]]
-    bank_unmatched = [int(i) for i in range(len(bank_df)) if i not in used_bank_idx]
-    return {"matches": matches, "erp_unmatched": erp_unmatched, "bank_unmatched": bank_unmatched}
+    index = _candidate_index(as_frame(payload["erp"]), as_frame(payload["bank"]))
+    return {"candidates": index.top_k(rows, side=side, k=k)}
@@ -0,0 +1,132 @@
+from typing import Dict, Any, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import json
+import os
+import resource
+import threading
+import time
+import pandas as pd
+from langchain_core.tools import tool
+from .profile_tools import profiled
+
+_SPANS: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("reconciliation_spans", default=None)
+
+def _rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class RssPeak:
+    """Polls the process RSS on a background thread and keeps the maximum seen."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval, self.base, self.peak = interval, 0, 0
+        self._stop = threading.Event()
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss())
+
+    def __enter__(self):
+        self.base = self.peak = _rss()
+        self._thread = threading.Thread(target=self._poll, daemon=True); self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set(); self._thread.join()
+        self.peak = max(self.peak, _rss())
+
+def count_rows(obj: Any) -> Optional[int]:
+    """Best-effort row count of a stage payload or result."""
+    if isinstance(obj, pd.DataFrame):
+        return len(obj)
+    if isinstance(obj, dict):
+        parts = [count_rows(obj[k]) for k in ("erp", "bank") if isinstance(obj.get(k), dict)]
+        parts = [p for p in parts if p is not None]
+        if parts:
+            return sum(parts)
+        for key in ("frame", "records", "results", "matches"):
+            if obj.get(key) is not None:
+                return len(obj[key])
+    return None
+
+@contextmanager
+def collect():
+    """Collect every span recorded in this context (and in threads started from a copy of it)."""
+    spans: List[Dict[str, Any]] = []
+    token = _SPANS.set(spans)
+    try:
+        yield spans
+    finally:
+        _SPANS.reset(token)
+
+@contextmanager
+def span(stage: str, rows_in: Optional[int] = None):
+    """
+    Time a pipeline stage: wall time, CPU time of the calling thread plus any
+    child processes that finished meanwhile, peak RSS growth, and row counts.
+    Set ``entry["rows_out"]`` inside the block to record output rows. When the
+    run is profiling (``profile_tools.profiling``) the stage is profiled too.
+    """
+    entry: Dict[str, Any] = {"stage": stage, "rows_in": rows_in, "rows_out": None, "thread": threading.current_thread().name}
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu, wall = time.thread_time(), time.perf_counter()
+    entry["started"] = time.time()
+    try:
+        with RssPeak() as rss, profiled(stage):
+            yield entry
+    finally:
+        wall = time.perf_counter() - wall
+        done = resource.getrusage(resource.RUSAGE_CHILDREN)
+        entry["wall_s"] = round(wall, 6)
+        entry["cpu_s"] = round(time.thread_time() - cpu + (done.ru_utime - children.ru_utime) + (done.ru_stime - children.ru_stime), 6)
+        entry["peak_rss_delta_mb"] = round((rss.peak - rss.base) / 2**20, 3)
+        rows = entry["rows_in"] or entry["rows_out"]
+        entry["rows_per_s"] = round(rows / wall, 1) if rows and wall > 0 else None
+        spans = _SPANS.get()
+        if spans is not None:
+            spans.append(entry)
+
+def instrument(stage: str):
+    """Decorator recording a span for every call of a tool function (place it under ``@tool``)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rows_in = next((n for n in map(count_rows, list(args) + list(kwargs.values())) if n is not None), None)
+            with span(stage, rows_in) as entry:
+                out = fn(*args, **kwargs)
+                entry["rows_out"] = count_rows(out)
+            return out
+        return wrapper
+    return deco
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"stages": list(spans), "total_wall_s": round(sum(s["wall_s"] for s in spans), 6)}
+
+def write_metrics(spans: List[Dict[str, Any]], out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, "metrics.json")
+    with open(path, "w") as f:
+        json.dump(summarize(spans), f, indent=2)
+    return path
+
+@tool("get_metrics")
+def get_metrics(_=None) -> Dict[str, Any]:
+    """
+    Retrieve the per-stage timing and resource spans recorded for the current run.
+
+    Args:
+        _ (Any): Placeholder argument (not used).
+
+    Returns:
+        Dict[str, Any]: Stage spans (wall/CPU time, row counts, peak memory delta)
+                        and the total wall time.
+
+    Author:
+        Dr. Ayushi Mandlik
+    """
+    return summarize(_SPANS.get() or [])
@@ -1,8 +1,19 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import numpy as np
 import pandas as pd
 from dateutil import parser
-from langchain.tools import tool
+from langchain_core.tools import tool
+from .metrics_tools import instrument
 import re
+from .table_tools import as_frame, categorical, category_index, table, text
+
+# Candidate formats tried (in order) when inferring a column's date format.
+_DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d.%m.%Y", "%m/%d/%Y", "%d/%m/%Y", "%m-%d-%Y", "%d-%m-%Y",
+                 "%d %b %Y", "%d-%b-%Y", "%b %d, %Y", "%d %B %Y", "%B %d, %Y", "%Y%m%d", "%Y-%m-%d %H:%M:%S")
+_DATE_SAMPLE = 200
+# Bump when normalized output changes for the same input (invalidates cached tables).
+NORMALIZER_VERSION = "3"
+_INV_RE = re.compile(r"(?:INV[-\s]?)(\d+)", flags=re.I)
 
 def _to_date(x):
     if pd.isna(x) or x == "":
@@ -12,13 +23,110 @@ def _to_date(x):
     except Exception:
         return None
 
-def _to_amount(x):
-    try:
-        return round(float(str(x).replace(',', '')), 2)
-    except Exception:
-        return None
+def _infer_date_format(values: pd.Series) -> Optional[str]:
+    sample = values.drop_duplicates().head(_DATE_SAMPLE)
+    best, best_hits = None, 0
+    for fmt in _DATE_FORMATS:
+        hits = pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum()
+        if hits == len(sample):
+            return fmt
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+    return best
+
+def _parse_dates(col: pd.Series) -> pd.Series:
+    """Datetimes for a whole column: one inferred format in bulk, dateutil only for leftovers."""
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col
+    out = pd.Series(pd.NaT, index=col.index, dtype="datetime64[ns]")
+    text = col[col.notna()].astype(str).str.strip()
+    text = text[text != ""]
+    if text.empty:
+        return out
+    fmt = _infer_date_format(text)
+    parsed = pd.to_datetime(text, format=fmt, errors="coerce") if fmt else pd.Series(pd.NaT, index=text.index)
+    ok = parsed.notna()
+    out.loc[ok[ok].index] = parsed[ok]
+    rest = text[~ok]
+    if len(rest):
+        memo = {v: _to_date(v) for v in rest.unique()}
+        out.loc[rest.index] = pd.to_datetime(rest.map(memo), format="%Y-%m-%d", errors="coerce")
+    return out
+
+def _day_numbers(dates: pd.Series) -> pd.Series:
+    """Int32 days since 1970-01-01 (<NA> where missing)."""
+    values = dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    nat = np.isnat(values)
+    return pd.Series(pd.arrays.IntegerArray(np.where(nat, 0, values.astype("int64")).astype("int32"), nat), index=dates.index)
+
+def _parse_amounts(col: pd.Series, decimal: Optional[str] = None) -> pd.Series:
+    """Amounts rounded to 2dp for a whole column, accepting thousands separators and (negatives)."""
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        values = col.astype(float)
+    else:
+        text = col.astype(str).str.strip()
+        negative = text.str.match(r"^\(.*\)$") | text.str.endswith("-")
+        text = text.str.replace(r"[\s '’()]|[^\d.,eE+\-]", "", regex=True).str.rstrip("-")
+        if decimal is None:
+            comma = text.str.contains(r",\d{1,2}$").sum()
+            dot = text.str.contains(r"\.\d{1,2}$").sum()
+            decimal = "," if comma > dot else "."
+        if decimal == ",":
+            text = text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        else:
+            text = text.str.replace(",", "", regex=False)
+        values = pd.to_numeric(text, errors="coerce")
+        values = values.where(~negative, -values.abs())
+    rounded = values.round(2)
+    # Binary halfway cases (e.g. 2.675) round differently in numpy; keep Python's round for those.
+    tie = (np.abs((values * 100) % 1 - 0.5) < 1e-6) & values.notna()
+    if tie.any():
+        memo = {v: round(float(v), 2) for v in values[tie].unique()}
+        rounded[tie] = values[tie].map(memo)
+    return rounded
+
+def _to_cents(amounts: pd.Series) -> pd.Series:
+    """Int64 integer cents (<NA> where missing) from amounts already rounded to 2dp."""
+    return (amounts * 100).round().astype("Int64")
+
+def _categorical(col: pd.Series, clean, keep_na: bool = False) -> pd.Series:
+    """
+    Categorical column with ``clean`` (a str-Series transform) applied once per distinct value.
+    With ``keep_na`` missing values, and values that are blank once cleaned, stay missing
+    (otherwise they become the cleaned text of their ``str``, e.g. "Nan").
+    """
+    codes, uniques = pd.factorize(col, use_na_sentinel=keep_na)
+    cleaned = clean(pd.Series(uniques, dtype=object).astype(str))
+    if keep_na:
+        cleaned = cleaned.where(cleaned != "")
+    new_codes, categories = pd.factorize(cleaned)
+    new_codes = np.append(new_codes, -1)
+    return pd.Series(pd.Categorical.from_codes(new_codes[codes], category_index(categories)), index=col.index)
+
+def _extract_invoice_ids(col: pd.Series) -> pd.Series:
+    if not (pd.api.types.is_object_dtype(col) or pd.api.types.is_string_dtype(col)):
+        return pd.Series(None, index=col.index, dtype=object)
+    digits = col.str.extract(_INV_RE, expand=False)
+    inv = "INV" + digits.str.zfill(4)
+    return inv.astype(object).where(digits.notna(), None)
+
+def _normalize_erp_frame(df: pd.DataFrame) -> pd.DataFrame:
+    if "Date" in df: df["Date"] = _day_numbers(_parse_dates(df["Date"]))
+    if "Amount" in df: df["Amount"] = _to_cents(_parse_amounts(df["Amount"]))
+    if "Invoice ID" in df: df["Invoice ID"] = _categorical(df["Invoice ID"], lambda s: s.str.strip().str.upper(), keep_na=True)
+    if "Status" in df: df["Status"] = _categorical(df["Status"], lambda s: s.str.strip().str.title())
+    return df
+
+def _normalize_bank_frame(df: pd.DataFrame) -> pd.DataFrame:
+    if "Date" in df: df["Date"] = _day_numbers(_parse_dates(df["Date"]))
+    if "Amount" in df: df["Amount"] = _to_cents(_parse_amounts(df["Amount"]))
+    if "Description" in df: df["Invoice ID"] = categorical(_extract_invoice_ids(df["Description"]))
+    for col in ("Description", "Ref ID"):
+        if col in df: df[col] = text(df[col])
+    return df
 
 @tool("normalize_erp")
+@instrument("normalize_erp")
 def normalize_erp(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Normalize ERP data for reconciliation by standardizing formats
@@ -28,19 +136,17 @@ def normalize_erp(payload: Dict[str, Any]) -> Dict[str, Any]:
         payload (Dict[str, Any]): Raw ERP data.
 
     Returns:
-        Dict[str, Any]: Normalized ERP records ready for matching.
+        Dict[str, Any]: Normalized ERP records ready for matching (dates as day
+                        numbers, amounts in integer cents, categorical IDs/status).
 
     Author:
         Dr. Ayushi Mandlik
     """
-    df = pd.DataFrame(payload["records"])
-    if "Date" in df: df["Date"] = df["Date"].apply(_to_date)
-    if "Amount" in df: df["Amount"] = df["Amount"].apply(_to_amount)
-    if "Invoice ID" in df: df["Invoice ID"] = df["Invoice ID"].astype(str).str.strip().str.upper()
-    if "Status" in df: df["Status"] = df["Status"].astype(str).str.strip().str.title()
-    return {"records": df.to_dict(orient="records")}
+    df = _normalize_erp_frame(as_frame(payload).copy(deep=False))
+    return table(df)
 
 @tool("normalize_bank")
+@instrument("normalize_bank")
 def normalize_bank(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Normalize bank statement data for reconciliation by standardizing
@@ -50,18 +156,11 @@ def normalize_bank(payload: Dict[str, Any]) -> Dict[str, Any]:
         payload (Dict[str, Any]): Raw bank data.
 
     Returns:
-        Dict[str, Any]: Normalized bank records ready for matching.
+        Dict[str, Any]: Normalized bank records ready for matching (dates as day
+                        numbers, amounts in integer cents, categorical Invoice ID).
 
     Author:
         Dr. Ayushi Mandlik
     """
-    df = pd.DataFrame(payload["records"])
-    if "Date" in df: df["Date"] = df["Date"].apply(_to_date)
-    if "Amount" in df: df["Amount"] = df["Amount"].apply(_to_amount)
-    if "Description" in df:
-        def extract_inv(text):
-            if not isinstance(text, str): return None
-            m = re.search(r"(?:INV[-\s]?)(\d+)", text, flags=re.I)
-            return "INV" + m.group(1).zfill(4) if m else None
-        df["Invoice ID"] = df["Description"].apply(extract_inv)
-    return {"records": df.to_dict(orient="records")}
+    df = _normalize_bank_frame(as_frame(payload).copy(deep=False))
+    return table(df)
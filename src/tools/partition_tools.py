@@ -0,0 +1,188 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .discrepancy_tools import classify_frames, duplicate_keys
+from .match_tools import _match_frames
+from .table_tools import cents, compact, keys
+
+# Spill schemas: normalized columns plus ``_row``, the row's position in its input file.
+_ROW = "_row"
+SCHEMAS = {
+    "erp": pa.schema([(_ROW, pa.int64()), ("Date", pa.int32()), ("Invoice ID", pa.string()), ("Amount", pa.int64()),
+                      ("Status", pa.string())]),
+    "bank": pa.schema([(_ROW, pa.int64()), ("Date", pa.int32()), ("Description", pa.string()), ("Amount", pa.int64()),
+                       ("Ref ID", pa.string()), ("Invoice ID", pa.string())]),
+}
+_NULLABLE = {pa.int32(): pd.Int32Dtype(), pa.int64(): pd.Int64Dtype()}.get
+
+def _months(df: pd.DataFrame) -> np.ndarray:
+    """Posting month as YYYYMM (0 where the date is missing)."""
+    if "Date" not in df:
+        return np.zeros(len(df), dtype=np.int64)
+    day = df["Date"].to_numpy(dtype="float64", na_value=np.nan)
+    month = np.nan_to_num(day).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return np.where(np.isnan(day), 0, (month // 12 + 1970) * 100 + month % 12 + 1)
+
+class PartitionStore:
+    """
+    Normalized ERP/bank rows spilled to Hive-style Parquet directories,
+    ``root/<side>/month=YYYYMM/bucket=B/part-NNNNN.parquet``. The bucket is a hash
+    of the Invoice ID modulo ``buckets``; rows without one go to bucket ``buckets``
+    (the unreferenced partition). Partitions are read back memory-mapped.
+    """
+
+    def __init__(self, root: str, buckets: int = 16):
+        self.root, self.buckets = root, buckets
+        self.columns: Dict[str, List[str]] = {}
+
+    def path(self, side: str, month: Optional[int] = None, bucket: Optional[int] = None) -> str:
+        parts = [self.root, side] + ([f"month={month}"] if month is not None else []) + ([f"bucket={bucket}"] if bucket is not None else [])
+        return os.path.join(*parts)
+
+    def _buckets(self, df: pd.DataFrame) -> np.ndarray:
+        k = keys(df)
+        hashed = (pd.util.hash_array(k) % np.uint64(self.buckets)).astype(np.int64)
+        return np.where(k == "", self.buckets, hashed)
+
+    def write(self, side: str, df: pd.DataFrame, part: int, schema: str = None) -> None:
+        """Append ``df`` (which carries ``_row``) to its (month, bucket) partitions."""
+        schema = SCHEMAS[schema or side]
+        self.columns.setdefault(side, [c for c in df.columns if c in schema.names and c != _ROW])
+        out = df.reindex(columns=schema.names)
+        for col in out.columns:
+            if isinstance(out[col].dtype, (pd.CategoricalDtype, pd.StringDtype)) or out[col].isna().all():
+                out[col] = out[col].astype(object).where(out[col].notna(), None)
+        months, buckets = _months(df), self._buckets(df)
+        for (m, b), rows in pd.Series(np.arange(len(out))).groupby([months, buckets]).indices.items():
+            path = self.path(side, m, b)
+            os.makedirs(path, exist_ok=True)
+            batch = pa.Table.from_pandas(out.iloc[rows], schema=schema, preserve_index=False)
+            pq.write_table(batch, os.path.join(path, f"part-{part:05d}.parquet"))
+
+    def empty(self, side: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        base = side.split("_")[0]
+        columns = columns or [_ROW] + self.columns.get(side, self.columns.get(base, []))
+        return pd.DataFrame({c: pd.Series(dtype=_NULLABLE(SCHEMAS[base].field(c).type) or object) for c in columns})
+
+    def read(self, side: str, month: Optional[int] = None, bucket: Optional[int] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        path = self.path(side, month, bucket)
+        if not os.path.isdir(path):
+            return self.empty(side, columns)
+        columns = columns or [_ROW] + self.columns.get(side, self.columns.get(side.split("_")[0], []))
+        table = pq.read_table(path, columns=columns, memory_map=True, partitioning=None)
+        return compact(table.to_pandas(types_mapper=_NULLABLE))
+
+    def months(self, side: str) -> List[int]:
+        path = self.path(side)
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(d.split("=", 1)[1]) for d in os.listdir(path) if d.startswith("month="))
+
+    def partitions(self) -> List[Tuple[int, int]]:
+        """Every (month, bucket) holding ERP or bank rows."""
+        found = set()
+        for side in ("erp", "bank"):
+            for m in self.months(side):
+                found |= {(m, int(d.split("=", 1)[1])) for d in os.listdir(self.path(side, m)) if d.startswith("bucket=")}
+        return sorted(found)
+
+def spill(store: PartitionStore, side: str, chunks: Iterable[pd.DataFrame], normalize: Callable[[pd.DataFrame], pd.DataFrame]) -> int:
+    """Normalize ``chunks`` one at a time into ``store``; returns the number of rows spilled."""
+    offset = 0
+    for part, chunk in enumerate(chunks):
+        df = normalize(chunk)
+        df.insert(0, _ROW, np.arange(offset, offset + len(df), dtype=np.int64))
+        store.write(side, df, part)
+        offset += len(df)
+    return offset
+
+def _classified(erp: pd.DataFrame, bank: pd.DataFrame, matches: Dict[str, Any], dup_keys: set) -> pd.DataFrame:
+    """Classification with partition-local indexes mapped back to input row numbers."""
+    out = classify_frames(erp, bank, matches, dup_keys)
+    for col, df in (("erp_index", erp), ("bank_index", bank)):
+        local = out[col]
+        rows = df[_ROW].to_numpy(dtype=np.int64)[local.fillna(0).to_numpy(dtype=int)] if len(df) else np.zeros(len(out), dtype=np.int64)
+        out[col] = pd.arrays.IntegerArray(rows, local.isna().to_numpy())
+    return out
+
+class _Results:
+    def __init__(self, path: str):
+        self.path, self.part, self.counts = path, 0, {}
+        os.makedirs(path, exist_ok=True)
+
+    def add(self, df: pd.DataFrame) -> None:
+        if not len(df):
+            return
+        df.to_parquet(os.path.join(self.path, f"part-{self.part:05d}.parquet"), index=False)
+        self.part += 1
+        for k, v in df["status"].value_counts().items():
+            self.counts[k] = self.counts.get(k, 0) + int(v)
+
+def _no_matches(n_erp: int, n_bank: int) -> Dict[str, Any]:
+    return {"matches": pd.DataFrame({"erp_index": [], "bank_index": []}, dtype=int), "groups": None,
+            "erp_unmatched": np.arange(n_erp), "bank_unmatched": np.arange(n_bank)}
+
+def _concat(carry: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    if not len(carry):
+        return df.reset_index(drop=True)
+    if not len(df):
+        return carry
+    # Columns typed differently (categoricals with other categories, all-NA columns) meet as objects; compact retypes them.
+    mixed = {c: object for c in df.columns if c in carry and carry[c].dtype != df[c].dtype}
+    return compact(pd.concat([carry.astype(mixed), df.astype(mixed)], ignore_index=True))
+
+def reconcile_partitioned(store: PartitionStore, match_kwargs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Match and classify a spilled ERP/bank pair partition by partition.
+
+    Pass 1 matches each (month, bucket) partition on its own and keeps only sure
+    pairs: same Invoice ID, amounts within the tolerance. Everything else is
+    written back as that month's leftovers. Pass 2 walks the months in order and
+    runs all matching tiers over one month's leftovers and unreferenced rows
+    together with the previous month's still-unmatched rows, so payments posted
+    shortly after month end still find their invoice. Rows unmatched after both
+    windows are reported missing. At most one partition, or two months of
+    leftovers, is held in memory at a time. Rows more than a month apart are
+    therefore never paired, so when an Invoice ID repeats in non-adjacent months
+    the pairs (and which copy is reported missing) can differ from the in-memory run.
+
+    Duplicate Invoice IDs are counted over the whole input (all months of a
+    bucket), as in the in-memory pipeline. Results are Parquet parts under
+    ``<root>/results`` with ``erp_index``/``bank_index`` as input row numbers.
+    """
+    kwargs = dict(match_kwargs or {})
+    tolerance = round(kwargs.get("amount_tolerance", 0.05) * 100)
+    results = _Results(store.path("results"))
+    dup_keys: set = set()
+    for b in range(store.buckets):
+        for side in ("erp", "bank"):
+            ids = [keys(store.read(side, m, b, ["Invoice ID"])) for m in store.months(side)]
+            dup_keys |= duplicate_keys(pd.DataFrame({"Invoice ID": np.concatenate(ids or [np.array([], dtype=object)])}))
+
+    for m, b in store.partitions():
+        erp, bank = store.read("erp", m, b), store.read("bank", m, b)
+        if b == store.buckets or not len(erp) or not len(bank):
+            store.write("erp_left", erp, b, "erp"); store.write("bank_left", bank, b, "bank")
+            continue
+        found = _match_frames(erp, bank, **{**kwargs, "fallback": False, "splits": False})
+        pairs = found["matches"]
+        e, bi = pairs["erp_index"].to_numpy(dtype=int), pairs["bank_index"].to_numpy(dtype=int)
+        sure = (keys(erp)[e] == keys(bank)[bi]) & (np.abs(cents(erp)[e] - cents(bank)[bi]) <= tolerance)
+        results.add(_classified(erp, bank, {"matches": pairs[sure], "groups": None, "erp_unmatched": [], "bank_unmatched": []}, dup_keys))
+        store.write("erp_left", erp.drop(index=e[sure]), b, "erp"); store.write("bank_left", bank.drop(index=bi[sure]), b, "bank")
+
+    carry_erp, carry_bank = store.empty("erp_left"), store.empty("bank_left")
+    for m in sorted(set(store.months("erp_left")) | set(store.months("bank_left"))):
+        erp = _concat(carry_erp, store.read("erp_left", m))
+        bank = _concat(carry_bank, store.read("bank_left", m))
+        found = _match_frames(erp, bank, **kwargs)
+        erp_open, bank_open = found["erp_unmatched"], found["bank_unmatched"]
+        final = {**found, "erp_unmatched": erp_open[erp_open < len(carry_erp)], "bank_unmatched": bank_open[bank_open < len(carry_bank)]}
+        results.add(_classified(erp, bank, final, dup_keys))
+        carry_erp = erp.iloc[erp_open[erp_open >= len(carry_erp)]].reset_index(drop=True)
+        carry_bank = bank.iloc[bank_open[bank_open >= len(carry_bank)]].reset_index(drop=True)
+    results.add(_classified(carry_erp, carry_bank, _no_matches(len(carry_erp), len(carry_bank)), dup_keys))
+    return {"dataset": results.path, "counts": results.counts}
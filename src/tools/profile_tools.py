@@ -0,0 +1,203 @@
+from typing import Any, Dict, List, Optional
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import contextlib
+import cProfile
+import inspect
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+
+_PROFILE: ContextVar[Optional["RunProfile"]] = ContextVar("reconciliation_profile", default=None)
+_LOCAL = threading.local()
+_TRACING_LOCK = threading.Lock()
+_TRACING = 0
+_IGNORED = (tracemalloc.__file__, __file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+def _start_tracing(frames: int) -> None:
+    global _TRACING
+    with _TRACING_LOCK:
+        if _TRACING == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        _TRACING += 1
+
+def _stop_tracing() -> List[tracemalloc.Statistic]:
+    """Live blocks allocated since tracing started, by line; tracing stops with its last user."""
+    global _TRACING
+    with _TRACING_LOCK:
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, f) for f in _IGNORED])
+        _TRACING -= 1
+        if _TRACING == 0:
+            tracemalloc.stop()
+    return snapshot.statistics("lineno")
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _depth(frame) -> int:
+    """Stack depth of the code that entered a stage, skipping the context-manager frames in between."""
+    while frame is not None and (frame.f_code.co_flags & inspect.CO_GENERATOR or frame.f_code.co_filename == contextlib.__file__):
+        frame = frame.f_back
+    n = 0
+    while frame is not None:
+        n, frame = n + 1, frame.f_back
+    return n
+
+class RunProfile:
+    """
+    CPU and allocation profile of one run, aggregated per stage.
+
+    Every stage (see ``metrics_tools.span``) runs under its own ``cProfile``
+    profiler and, with ``memory``, under ``tracemalloc``: the blocks allocated
+    during the stage and still alive at its end give its allocation sites.
+    Tracing is on only while some stage runs, so its cost stays inside them. A background thread samples
+    the stacks of threads inside a stage every ``interval_ms`` for collapsed-stack
+    (flame graph) output. Stages nested in another stage on the same thread are
+    counted in the outer one; allocations of stages running at the same time on
+    other threads show up in both. Work done in worker processes isn't profiled.
+    """
+
+    def __init__(self, top_n: int = 25, memory: bool = True, interval_ms: float = 5.0, trace_frames: int = 1):
+        self.top_n, self.memory, self.interval_ms, self.trace_frames = top_n, memory, interval_ms, trace_frames
+        self.stats: Dict[str, pstats.Stats] = {}
+        self.calls: Counter = Counter()
+        self.allocations: Dict[str, Counter] = {}
+        self.stacks: Counter = Counter()
+        self._active: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval_ms > 0:
+            self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+            self._sampler.start()
+
+    def stop(self) -> None:
+        if self._sampler is not None:
+            self._stop.set(); self._sampler.join()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval_ms / 1000):
+            frames = sys._current_frames()
+            with self._lock:
+                active = list(self._active.items())
+            for ident, (stage, depth) in active:
+                frame, stack = frames.get(ident), []
+                while frame is not None:
+                    stack.append(_frame_name(frame)); frame = frame.f_back
+                # Frames above the stage's entry point are the same for every sample; drop them.
+                stack = stack[::-1][depth:]
+                with self._lock:
+                    self.stacks[";".join([stage] + stack)] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        if getattr(_LOCAL, "stage", None) is not None:
+            yield
+            return
+        profiler = cProfile.Profile()
+        if self.memory:
+            _start_tracing(self.trace_frames)
+        ident = threading.get_ident()
+        _LOCAL.stage = name
+        with self._lock:
+            self._active[ident] = (name, _depth(sys._getframe()))
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler already owns this interpreter (Python 3.12+); keep the samples and allocations only.
+            profiler = None
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            with self._lock:
+                self._active.pop(ident, None)
+            _LOCAL.stage = None
+            grown = _stop_tracing() if self.memory else []
+            with self._lock:
+                self.calls[name] += 1
+                if profiler is not None:
+                    if name in self.stats:
+                        self.stats[name].add(profiler)
+                    else:
+                        self.stats[name] = pstats.Stats(profiler)
+                sites = self.allocations.setdefault(name, Counter())
+                for stat in grown:
+                    tb = stat.traceback[0]
+                    sites[f"{tb.filename}:{tb.lineno}"] += stat.size
+
+    def _functions(self, stage: str) -> List[Dict[str, Any]]:
+        stats = self.stats.get(stage)
+        if stats is None:
+            return []
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+            rows.append({"function": f"{func} ({filename}:{line})", "calls": nc, "primitive_calls": cc,
+                         "tottime_s": round(tt, 6), "cumtime_s": round(ct, 6)})
+        return sorted(rows, key=lambda r: r["cumtime_s"], reverse=True)[:self.top_n]
+
+    def report(self) -> Dict[str, Any]:
+        stages = {}
+        for stage in self.calls:
+            sites = self.allocations.get(stage, Counter()).most_common(self.top_n)
+            stages[stage] = {"calls": self.calls[stage], "functions": self._functions(stage),
+                             "allocations": [{"site": site, "size_kib": round(size / 1024, 1)} for site, size in sites]}
+        return {"top_n": self.top_n, "interval_ms": self.interval_ms, "samples": sum(self.stacks.values()), "stages": stages}
+
+    def write(self, out_dir: str) -> Dict[str, str]:
+        """``profile.txt`` (readable top-N per stage), ``profile.json`` and ``profile.collapsed`` in ``out_dir``."""
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {"txt": os.path.join(out_dir, "profile.txt"), "json": os.path.join(out_dir, "profile.json"),
+                 "collapsed": os.path.join(out_dir, "profile.collapsed")}
+        with self._lock:
+            stacks = sorted(self.stacks.items())
+        with open(paths["json"], "w") as f:
+            json.dump(self.report(), f, indent=2)
+        with open(paths["collapsed"], "w") as f:
+            f.writelines(f"{stack} {n}\n" for stack, n in stacks)
+        with open(paths["txt"], "w") as f:
+            for stage in self.calls:
+                f.write(f"=== {stage} ({self.calls[stage]} calls) ===\n")
+                if stage in self.stats:
+                    out = io.StringIO()
+                    stats = self.stats[stage]
+                    stats.stream = out
+                    stats.sort_stats("cumulative").print_stats(self.top_n)
+                    f.write(out.getvalue().split("\n", 1)[-1].lstrip("\n"))
+                sites = self.allocations.get(stage, Counter()).most_common(self.top_n)
+                if sites:
+                    f.write(f"Top {len(sites)} allocation sites (net growth):\n")
+                    f.writelines(f"  {size / 1024:12.1f} KiB  {site}\n" for site, size in sites)
+                f.write("\n")
+        return paths
+
+@contextmanager
+def profiling(top_n: int = 25, memory: bool = True, interval_ms: float = 5.0, trace_frames: int = 1):
+    """Profile every stage run in this context (and in threads started from a copy of it)."""
+    profile = RunProfile(top_n=top_n, memory=memory, interval_ms=interval_ms, trace_frames=trace_frames)
+    token = _PROFILE.set(profile)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+        _PROFILE.reset(token)
+
+@contextmanager
+def profiled(stage: str):
+    """Profile ``stage`` when the current context is profiling; otherwise a no-op."""
+    profile = _PROFILE.get()
+    if profile is None:
+        yield
+        return
+    with profile.stage(stage):
+        yield
@@ -1,53 +1,197 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 import os
 import pandas as pd
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
-from langchain.tools import tool
+from langchain_core.tools import tool
+from .metrics_tools import instrument
+from .run_context import current_run
+from .table_tools import as_frame, to_display
+
+# Output formats export_outputs can write, and the default selection.
+EXPORT_FORMATS = ("csv", "xlsx", "pdf", "parquet")
+DEFAULT_FORMATS = ("csv", "xlsx", "pdf")
+_XLSX_MAX_ROWS = 1_048_576
+
+def _reconciled_schema():
+    """Arrow schema of ``reconciled.parquet`` (built on use so pyarrow is only imported for Parquet exports)."""
+    import pyarrow as pa
+    return pa.schema([("ERP Index", pa.float64()), ("Bank Index", pa.float64()), ("Status", pa.string()),
+                      ("Amount Diff", pa.float64()), ("Rationale", pa.string())])
+
+def _write_csv(reconciled_df: pd.DataFrame, path: str) -> None:
+    reconciled_df.to_csv(path, index=False)
+
+def _write_parquet(reconciled_df: pd.DataFrame, path: str) -> None:
+    reconciled_df.to_parquet(path, index=False)
+
+def _cells(df: pd.DataFrame) -> Iterator[tuple]:
+    """Rows of ``df`` as tuples of plain Python values (None for missing), column by column converted."""
+    cols = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns]
+    return zip(*cols)
+
+def _append_sheet(wb, title: str, frames: Iterable[pd.DataFrame]) -> None:
+    """Stream ``frames`` into write-only sheets, continuing on ``title_2``… past Excel's row limit."""
+    ws, n, part, header = None, 0, 1, None
+    for df in frames:
+        header = [str(c) for c in df.columns]
+        for row in _cells(df):
+            if ws is None or n >= _XLSX_MAX_ROWS:
+                ws = wb.create_sheet(title if part == 1 else f"{title}_{part}"); part += 1
+                ws.append(header); n = 1
+            ws.append(row); n += 1
+    if ws is None and header is not None:
+        wb.create_sheet(title).append(header)
+
+def _write_xlsx(sheets: Dict[str, Iterable[pd.DataFrame]], path: str) -> None:
+    """Constant-memory workbook: openpyxl write-only mode, rows streamed per sheet."""
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    for title, frames in sheets.items():
+        _append_sheet(wb, title, frames)
+    wb.save(path)
+
+def _write_pdf(totals: Dict[str, int], path: str, details: str) -> None:
+    c = canvas.Canvas(path, pagesize=A4)
+    width, height = A4
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(2*cm, height-2*cm, "Financial Reconciliation Summary")
+    c.setFont("Helvetica", 10)
+    y = height-3*cm
+    for k, v in totals.items():
+        c.drawString(2*cm, y, f"{k}: {v}"); y -= 0.6*cm
+    c.drawString(2*cm, y, f"Total Records: {sum(totals.values())}"); y -= 1.0*cm
+    c.drawString(2*cm, y, f"See {details} for details.")
+    c.showPage(); c.save()
+
+def _status_totals(status: pd.Series) -> Dict[str, int]:
+    return {k: int(v) for k, v in status.value_counts().items()}
+
+def _details(paths: Dict[str, Optional[str]]) -> str:
+    names = [os.path.basename(paths[f]) for f in ("xlsx", "csv", "parquet") if paths.get(f)]
+    return " and ".join(names) or "the run outputs"
+
+def _check_formats(formats: Iterable[str]) -> List[str]:
+    formats = [f.strip().lower() for f in formats if f.strip()]
+    unknown = sorted(set(formats) - set(EXPORT_FORMATS))
+    if unknown:
+        raise ValueError(f"Unknown export format(s) {unknown}; expected some of {EXPORT_FORMATS}")
+    return formats
+
+def reconciled_frame(disc: pd.DataFrame) -> pd.DataFrame:
+    """Report layout of a classification frame (display units, joined rationale)."""
+    disc = to_display(disc)
+    return pd.DataFrame({
+        "ERP Index": disc["erp_index"].astype("float64"), "Bank Index": disc["bank_index"].astype("float64"),
+        "Status": disc["status"], "Amount Diff": disc["amount_diff"],
+        "Rationale": [" | ".join(r if r is not None else []) for r in disc["rationale"]],
+    })
+
+def _export_dataset(results_dir: str, out_dir: str, formats: List[str]) -> Dict[str, Any]:
+    """
+    Stream a partitioned classification (Parquet parts under ``results_dir``) into
+    the requested files one part at a time; the PDF comes from running totals.
+    """
+    paths = {f: (os.path.join(out_dir, "summary.pdf" if f == "pdf" else f"reconciled.{f}") if f in formats else None) for f in EXPORT_FORMATS}
+    totals: Dict[str, int] = {}
+    names = sorted(os.listdir(results_dir))
+
+    def parts() -> Iterator[pd.DataFrame]:
+        for name in names:
+            disc = pd.read_parquet(os.path.join(results_dir, name))
+            for k, v in _status_totals(disc["status"]).items():
+                totals[k] = totals.get(k, 0) + v
+            yield reconciled_frame(disc)
+
+    empty = reconciled_frame(pd.DataFrame({"erp_index": [], "bank_index": [], "status": [], "amount_diff": [], "rationale": []}))
+    writer = schema = None
+    if paths["parquet"]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = _reconciled_schema()
+        writer = pq.ParquetWriter(paths["parquet"], schema)
+    first = True
+    try:
+        def tee() -> Iterator[pd.DataFrame]:
+            nonlocal first
+            for df in parts():
+                if paths["csv"]:
+                    df.to_csv(paths["csv"], index=False, header=first, mode="w" if first else "a")
+                if writer:
+                    writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+                first = False
+                yield df
+        if paths["xlsx"]:
+            _write_xlsx({"reconciliation": tee()}, paths["xlsx"])
+        else:
+            for _ in tee():
+                pass
+    finally:
+        if writer:
+            writer.close()
+    if first and paths["csv"]:
+        empty.to_csv(paths["csv"], index=False)
+    if paths["pdf"]:
+        _write_pdf(dict(sorted(totals.items(), key=lambda kv: -kv[1])), paths["pdf"], _details(paths))
+    return paths
 
 @tool("export_outputs")
-def export_outputs(payload: Dict[str, Any]) -> Dict[str, Any]:
+@instrument("export_outputs")
+def export_outputs(payload: Dict[str, Any], parallel: bool = False, formats: Optional[List[str]] = None) -> Dict[str, Any]:
     """
     Export reconciliation results, discrepancies, and metadata into
     structured output files (e.g., Excel, JSON).
 
+    Only the requested formats are written. The XLSX workbook is streamed in
+    openpyxl write-only mode (constant memory, continuing on extra sheets past
+    Excel's row limit) and the PDF summary uses one status count over the
+    classification. A partitioned classification (``{"dataset": dir}`` from
+    out-of-core runs) is streamed part by part into every format, with only the
+    reconciliation sheet in the workbook.
+
     Args:
         payload (Dict[str, Any]): A dictionary containing reconciliation
                                   results, logs, and classified discrepancies.
+        parallel (bool, optional): Write the requested files concurrently
+                                   on a thread pool. Defaults to False.
+        formats (List[str], optional): Any of "csv", "xlsx", "pdf" and "parquet".
+                                   Defaults to csv, xlsx and pdf.
 
     Returns:
-        Dict[str, Any]: Metadata about exported files (e.g., file paths).
+        Dict[str, Any]: Metadata about exported files (e.g., file paths);
+                        formats not requested map to None.
 
     Author:
         Dr. Ayushi Mandlik
     """
-    out_dir = payload.get("out_dir", "outputs")
+    formats = _check_formats(DEFAULT_FORMATS if formats is None else formats)
+    run = current_run()
+    out_dir = payload.get("out_dir") or (run.out_dir if run else "outputs")
     os.makedirs(out_dir, exist_ok=True)
-    erp = pd.DataFrame(payload["erp"]["records"])
-    bank = pd.DataFrame(payload["bank"]["records"])
-    rec_rows = []
-    for r in payload["discrepancies"]["results"]:
-        rec_rows.append({"ERP Index": r.get("erp_index"), "Bank Index": r.get("bank_index"), "Status": r.get("status"), "Amount Diff": r.get("amount_diff"), "Rationale": " | ".join(r.get("rationale") or [])})
-    reconciled_df = pd.DataFrame(rec_rows)
-    csv_path = os.path.join(out_dir, "reconciled.csv")
-    xlsx_path = os.path.join(out_dir, "reconciled.xlsx")
-    report_pdf = os.path.join(out_dir, "summary.pdf")
-    reconciled_df.to_csv(csv_path, index=False)
-    with pd.ExcelWriter(xlsx_path) as writer:
-        reconciled_df.to_excel(writer, sheet_name="reconciliation", index=False)
-        erp.to_excel(writer, sheet_name="erp_normalized", index=False)
-        bank.to_excel(writer, sheet_name="bank_normalized", index=False)
-    c = canvas.Canvas(report_pdf, pagesize=A4)
-    width, height = A4
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(2*cm, height-2*cm, "Financial Reconciliation Summary")
-    c.setFont("Helvetica", 10)
-    totals = reconciled_df["Status"].value_counts().to_dict()
-    y = height-3*cm
-    for k, v in totals.items():
-        c.drawString(2*cm, y, f"{k}: {v}"); y -= 0.6*cm
-    c.drawString(2*cm, y, f"Total Records: {len(reconciled_df)}"); y -= 1.0*cm
-    c.drawString(2*cm, y, "See reconciled.xlsx and reconciled.csv for details.")
-    c.showPage(); c.save()
-    return {"csv": csv_path, "xlsx": xlsx_path, "pdf": report_pdf}
+    if "dataset" in payload["discrepancies"]:
+        return _export_dataset(payload["discrepancies"]["dataset"], out_dir, formats)
+    disc = as_frame(payload["discrepancies"], "results")
+    paths = {f: (os.path.join(out_dir, "summary.pdf" if f == "pdf" else f"reconciled.{f}") if f in formats else None) for f in EXPORT_FORMATS}
+    jobs = []
+    if paths["pdf"]:
+        jobs.append((_write_pdf, _status_totals(disc["status"]), paths["pdf"], _details(paths)))
+    if paths["csv"] or paths["xlsx"] or paths["parquet"]:
+        reconciled_df = reconciled_frame(disc)
+        if paths["csv"]:
+            jobs.append((_write_csv, reconciled_df, paths["csv"]))
+        if paths["parquet"]:
+            jobs.append((_write_parquet, reconciled_df, paths["parquet"]))
+        if paths["xlsx"]:
+            sheets = {"reconciliation": [reconciled_df], "erp_normalized": [to_display(as_frame(payload["erp"]))],
+                      "bank_normalized": [to_display(as_frame(payload["bank"]))]}
+            jobs.append((_write_xlsx, sheets, paths["xlsx"]))
+    if parallel and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            for f in [pool.submit(*job) for job in jobs]:
+                f.result()
+    else:
+        for fn, *args in jobs:
+            fn(*args)
+    return paths
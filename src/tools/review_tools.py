@@ -0,0 +1,171 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import re
+import uuid
+import numpy as np
+import pandas as pd
+from .table_tools import to_display
+
+# Bump when the prompt or the item layout changes (invalidates cached verdicts).
+PROMPT_VERSION = "1"
+VERDICTS = ("confirm", "reject", "unsure")
+_ERP_FIELDS = ("Date", "Invoice ID", "Amount", "Status")
+_BANK_FIELDS = ("Date", "Description", "Amount", "Ref ID")
+_JSON_RE = re.compile(r"\[.*\]", flags=re.S)
+
+_INSTRUCTIONS = (
+    "You review bank reconciliation results. Each item pairs an ERP record with a bank "
+    "transaction (either side may be missing) and carries the automatic status and rationale. "
+    "For every item decide whether the status is right: \"confirm\", \"reject\" or \"unsure\", "
+    "with a one-sentence note. Answer with only a JSON array of "
+    "{\"id\": <item id>, \"verdict\": ..., \"note\": ...} objects, one per item."
+)
+
+class ReviewCache:
+    """Model verdicts on disk, one JSON file per item fingerprint (see ``fingerprint``)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, fp: str) -> str:
+        return os.path.join(self.root, fp[:2], f"{fp}.json")
+
+    def get(self, fp: str) -> Optional[Dict[str, str]]:
+        try:
+            with open(self._path(fp)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, fp: str, verdict: Dict[str, str]) -> None:
+        path = self._path(fp)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(verdict, f)
+        os.replace(tmp, path)
+
+def _sides(df: pd.DataFrame, idx: pd.Series, fields: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+    """Display values of ``fields`` for the rows ``idx`` of ``df`` (None where ``idx`` is missing)."""
+    missing = idx.isna().to_numpy()
+    if missing.all() or not len(df):
+        return [None] * len(idx)
+    rows = to_display(df.iloc[idx.fillna(0).to_numpy(dtype=int)])
+    cols = [f for f in fields if f in rows.columns]
+    values = rows[cols].astype(object).where(rows[cols].notna(), None).to_dict(orient="records")
+    return [None if m else v for m, v in zip(missing, values)]
+
+def review_items(erp_df: pd.DataFrame, bank_df: pd.DataFrame, results: pd.DataFrame, rows: np.ndarray) -> List[Dict[str, Any]]:
+    """Prompt items for the ``rows`` (positions) of a classification frame, in display units."""
+    picked = results.iloc[rows]
+    erp, bank = _sides(erp_df, picked["erp_index"], _ERP_FIELDS), _sides(bank_df, picked["bank_index"], _BANK_FIELDS)
+    return [{"erp": e, "bank": b, "status": s, "rationale": list(r) if r is not None else []}
+            for e, b, s, r in zip(erp, bank, picked["status"], picked["rationale"])]
+
+def fingerprint(item: Dict[str, Any], model: str) -> str:
+    """Key of an item's verdict: its normalized content (not its row numbers), the model and the prompt version."""
+    body = json.dumps([PROMPT_VERSION, model, item], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+def _parse(text: str, n: int) -> Dict[int, Dict[str, str]]:
+    match = _JSON_RE.search(text or "")
+    try:
+        answers = json.loads(match.group(0)) if match else []
+    except ValueError:
+        return {}
+    out = {}
+    for a in answers if isinstance(answers, list) else []:
+        if not isinstance(a, dict):
+            continue
+        verdict = str(a.get("verdict", "")).strip().lower()
+        try:
+            i = int(a.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= i < n and verdict in VERDICTS:
+            out[i] = {"verdict": verdict, "note": str(a.get("note") or "").strip()}
+    return out
+
+def _ask(llm, items: List[Dict[str, Any]], limiter) -> Optional[Dict[int, Dict[str, str]]]:
+    """Verdicts by item position for one prompt, or None when the model call fails (the rows stay unreviewed)."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    if limiter is not None:
+        limiter.acquire(blocking=True)
+    body = json.dumps([{"id": i, **item} for i, item in enumerate(items)], default=str)
+    try:
+        reply = llm.invoke([SystemMessage(content=_INSTRUCTIONS), HumanMessage(content=body)])
+    except Exception:
+        return None
+    return _parse(getattr(reply, "content", reply), len(items))
+
+def select_for_review(results: pd.DataFrame, matches: Optional[pd.DataFrame], min_score: float,
+                      statuses: Iterable[str]) -> np.ndarray:
+    """
+    Positions of the low-confidence rows: pairs whose match score is below
+    ``min_score`` and rows whose status is one of ``statuses``.
+    """
+    low = results["status"].isin(list(statuses)).to_numpy()
+    if matches is not None and len(matches) and "score" in matches:
+        scores = matches.drop_duplicates(["erp_index", "bank_index"]).set_index(["erp_index", "bank_index"])["score"]
+        pairs = results["erp_index"].notna() & results["bank_index"].notna()
+        keys = pd.MultiIndex.from_arrays([results["erp_index"].fillna(-1).astype("int64"), results["bank_index"].fillna(-1).astype("int64")])
+        score = scores.reindex(keys).to_numpy(dtype=float)
+        low |= pairs.to_numpy() & (score < min_score)
+    return np.flatnonzero(low)
+
+def review_frame(erp_df: pd.DataFrame, bank_df: pd.DataFrame, results: pd.DataFrame, matches: Optional[pd.DataFrame],
+                 llm, model: str = "", min_score: float = 60.0, statuses: Iterable[str] = ("Amount mismatch",),
+                 batch_size: int = 25, concurrency: int = 4, requests_per_minute: float = 60.0,
+                 cache_dir: str = "", max_rows: int = 2_000) -> Dict[str, Any]:
+    """
+    Escalate the low-confidence rows of a classification frame to ``llm``.
+
+    Rows are chosen by ``select_for_review`` (at most ``max_rows``), verdicts
+    already in the cache are reused, and the rest are sent ``batch_size`` rows per
+    prompt on ``concurrency`` threads, at most ``requests_per_minute`` prompts a
+    minute. ``llm`` is any LangChain chat model; the stand-in
+    ``langchain_core.language_models.fake_chat_models.FakeListChatModel`` works
+    without network access. Statuses are left as they are: the verdict goes into
+    a ``review`` column and its note is appended to the row's rationale.
+    Returns the reviewed frame and counts of escalated, cached and answered rows;
+    a failed prompt leaves its rows unreviewed and is counted, not raised.
+    """
+    rows = select_for_review(results, matches, min_score, statuses)[:max_rows]
+    items = review_items(erp_df, bank_df, results, rows)
+    fps = [fingerprint(item, model) for item in items]
+    cache = ReviewCache(cache_dir) if cache_dir else None
+    verdicts: Dict[int, Dict[str, str]] = {}
+    for k, fp in enumerate(fps):
+        hit = cache.get(fp) if cache else None
+        if hit is not None:
+            verdicts[k] = hit
+    cached = len(verdicts)
+
+    todo = [k for k in range(len(items)) if k not in verdicts]
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), max(1, batch_size))]
+    limiter = None
+    if batches and requests_per_minute > 0:
+        from langchain_core.rate_limiters import InMemoryRateLimiter
+        limiter = InMemoryRateLimiter(requests_per_second=requests_per_minute / 60, check_every_n_seconds=0.05, max_bucket_size=max(1, concurrency))
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches) or 1))) as pool:
+        answers = list(pool.map(lambda batch: _ask(llm, [items[k] for k in batch], limiter), batches))
+    for batch, answer in zip(batches, answers):
+        for i, verdict in (answer or {}).items():
+            verdicts[batch[i]] = verdict
+            if cache:
+                cache.put(fps[batch[i]], verdict)
+
+    out = results.copy()
+    review = np.full(len(out), None, dtype=object)
+    rationale = out["rationale"].tolist()
+    for k, verdict in verdicts.items():
+        pos = rows[k]
+        review[pos] = verdict["verdict"]
+        rationale[pos] = list(rationale[pos] or []) + [f"Model review: {verdict['verdict']}" + (f" ({verdict['note']})" if verdict["note"] else "") + "."]
+    out["review"] = review
+    out["rationale"] = rationale
+    return {"frame": out, "escalated": len(items), "cached": cached, "answered": len(verdicts) - cached,
+            "prompts": len(batches), "failed_prompts": sum(a is None for a in answers)}
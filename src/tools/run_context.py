@@ -0,0 +1,42 @@
+from typing import Dict, Any, Deque, Optional
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import os
+import uuid
+
+DEFAULT_LOG_LIMIT = 10_000
+
+@dataclass
+class RunContext:
+    """State owned by one reconciliation run: its id, bounded log buffer and output directory."""
+    run_id: str
+    out_dir: str
+    log: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=DEFAULT_LOG_LIMIT))
+
+_CURRENT: ContextVar[Optional[RunContext]] = ContextVar("reconciliation_run", default=None)
+
+def new_run_id() -> str:
+    """Sortable id that is unique across threads and processes."""
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+def current_run() -> Optional[RunContext]:
+    return _CURRENT.get()
+
+@contextmanager
+def run_context(out_dir: str, run_id: Optional[str] = None, scoped: bool = True, log_limit: int = DEFAULT_LOG_LIMIT):
+    """
+    Make a new run current for this thread/task. With ``scoped`` the run writes
+    into ``out_dir/<run_id>`` so concurrent runs never share output files.
+    """
+    run_id = run_id or new_run_id()
+    run_dir = os.path.join(out_dir, run_id) if scoped else out_dir
+    os.makedirs(run_dir, exist_ok=True)
+    ctx = RunContext(run_id=run_id, out_dir=run_dir, log=deque(maxlen=log_limit))
+    token = _CURRENT.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _CURRENT.reset(token)
@@ -0,0 +1,90 @@
+from typing import Any, Dict, Iterable, Optional
+from multiprocessing import shared_memory
+import numpy as np
+
+_ALIGN = 8
+_WORKER: Optional["SharedColumns"] = None
+
+class Strings:
+    """Read-only string column stored as UTF-8 bytes plus offsets (the Arrow layout)."""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets, self.data = offsets, data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode()
+
+    def take(self, rows: Iterable[int]) -> np.ndarray:
+        return np.array([self[i] for i in rows], dtype=object)
+
+class SharedColumns:
+    """
+    Numeric and string columns packed into one shared-memory segment.
+
+    The owner builds it from arrays and closes it (which unlinks the segment);
+    pool workers ``attach`` to ``spec`` and read the columns zero-copy, so a
+    process pool never pickles the inputs.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, columns: Dict[str, Any], owner: bool):
+        self.shm, self.columns, self.owner = shm, columns, owner
+        self.spec: Dict[str, Any] = {}
+
+    @classmethod
+    def create(cls, arrays: Dict[str, np.ndarray], strings: Optional[Dict[str, Iterable[str]]] = None) -> "SharedColumns":
+        parts = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+        for name, values in (strings or {}).items():
+            encoded = [s.encode() for s in values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+            parts[f"{name}.offsets"] = offsets
+            parts[f"{name}.data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        layout, size = {}, 0
+        for name, a in parts.items():
+            layout[name] = (size, a.dtype.str, a.shape)
+            size += -(-a.nbytes // _ALIGN) * _ALIGN
+        shm = shared_memory.SharedMemory(create=True, size=max(size, _ALIGN))
+        for name, a in parts.items():
+            offset, dtype, shape = layout[name]
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = a
+        shared = cls(shm, _views(shm, layout, list(strings or ())), owner=True)
+        shared.spec = {"name": shm.name, "layout": layout, "strings": list(strings or ())}
+        return shared
+
+    @classmethod
+    def attach(cls, spec: Dict[str, Any]) -> "SharedColumns":
+        # Workers share the owner's resource tracker, so attaching doesn't add a second unlink.
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        return cls(shm, _views(shm, spec["layout"], spec["strings"]), owner=False)
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+    def close(self) -> None:
+        self.columns = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self) -> "SharedColumns":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def _views(shm: shared_memory.SharedMemory, layout: Dict[str, Any], strings) -> Dict[str, Any]:
+    views = {name: np.ndarray(tuple(shape), dtype=dtype, buffer=shm.buf, offset=offset) for name, (offset, dtype, shape) in layout.items()}
+    for name in strings:
+        views[name] = Strings(views.pop(f"{name}.offsets"), views.pop(f"{name}.data"))
+    return views
+
+def init_worker(spec: Dict[str, Any]) -> None:
+    """Pool initializer: attach the run's shared columns once per worker process."""
+    global _WORKER
+    _WORKER = SharedColumns.attach(spec)
+
+def worker_columns() -> SharedColumns:
+    return _WORKER
@@ -0,0 +1,151 @@
+from typing import Dict, List, Optional
+import time
+import numpy as np
+import pandas as pd
+from .normalize_tools import _INV_RE
+from .table_tools import cents
+
+_MIN_ITEMS = 2
+_CHUNK = 1 << 16
+
+def _half_sums(cents: np.ndarray):
+    """Sums and sizes of every subset of ``cents``; bit ``i`` of a subset's position selects item ``i``."""
+    sums, sizes = np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    for c in cents:
+        sums = np.concatenate([sums, sums + c]); sizes = np.concatenate([sizes, sizes + 1])
+    return sums, sizes
+
+def _smallest_per_sum(sums: np.ndarray, sizes: np.ndarray, min_size: int):
+    """Subsets with at least ``min_size`` items, one per distinct sum (the smallest), sorted by sum."""
+    pos = np.flatnonzero(sizes >= min_size)
+    pos = pos[np.lexsort((sizes[pos], sums[pos]))]
+    first = np.ones(len(pos), dtype=bool)
+    first[1:] = sums[pos[1:]] != sums[pos[:-1]]
+    pos = pos[first]
+    return sums[pos], pos
+
+def subset_sum(cents: np.ndarray, target: int, max_items: int, deadline: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    Positions of a smallest subset (``_MIN_ITEMS``..``max_items`` items) of ``cents``
+    summing exactly to ``target``, by meet-in-the-middle over the two halves.
+    None when there is no such subset or ``deadline`` (perf_counter) passes first;
+    the deadline is checked between chunks of ``_CHUNK`` left subsets, so searches
+    over up to 33 items (one chunk) always run to the end.
+    """
+    cents = np.asarray(cents, dtype=np.int64)
+    h = len(cents) // 2
+    left, left_n = _half_sums(cents[:h])
+    right, right_n = _half_sums(cents[h:])
+    # For each left subset, the right half needs the smallest subset with the missing sum
+    # that still brings the total to _MIN_ITEMS: one lookup table per minimum right size.
+    tables = [_smallest_per_sum(right, right_n, m) for m in range(_MIN_ITEMS + 1)]
+    best = None
+    for start in range(0, len(left), _CHUNK):
+        if start and deadline is not None and time.perf_counter() > deadline:
+            return None
+        need = target - left[start:start + _CHUNK]
+        short = np.maximum(_MIN_ITEMS - left_n[start:start + _CHUNK], 0)
+        for m, (sums, pos) in enumerate(tables):
+            rows = np.flatnonzero(short == m)
+            if not len(rows) or not len(sums):
+                continue
+            at = np.minimum(np.searchsorted(sums, need[rows]), len(sums) - 1)
+            size = left_n[start + rows] + right_n[pos[at]]
+            ok = np.flatnonzero((sums[at] == need[rows]) & (size <= max_items))
+            if len(ok):
+                k = ok[np.argmin(size[ok])]
+                if best is None or size[k] < best[0]:
+                    best = (size[k], start + rows[k], pos[at[k]])
+    if best is None:
+        return None
+    _, li, ri = best
+    return np.array([i for i in range(h) if li >> i & 1] + [h + i for i in range(len(cents) - h) if ri >> i & 1], dtype=int)
+
+def _groups_by(keys: pd.Series) -> Dict[str, np.ndarray]:
+    keys = keys[keys.notna()]
+    rows = keys.index.to_numpy()
+    return {k: rows[v] for k, v in keys.groupby(keys, sort=False, observed=True).indices.items()}
+
+def find_splits(erp_df: pd.DataFrame, bank_df: pd.DataFrame, erp_day: np.ndarray, bank_day: np.ndarray,
+                erp_free: np.ndarray, bank_free: np.ndarray, window_days: int = 30, max_candidates: int = 20,
+                max_items: int = 5, time_budget_ms: int = 50, by_date: bool = False,
+                max_searches: Optional[int] = 10_000) -> pd.DataFrame:
+    """
+    Many-to-one groups among the free rows, as (group, erp_index, bank_index, by_date) links.
+
+    First every free ERP row looks for instalments: free bank rows carrying the same
+    Invoice ID whose amounts add up to it. Then every free bank row looks for a batch
+    of ERP rows it settles: the invoices its description references. Only with
+    ``by_date`` does a bank row that references no invoice search the ERP rows
+    closest in date; such groups share no reference, so any rows whose amounts
+    happen to add up qualify, and they are flagged ``by_date`` (lower confidence).
+    Candidates must lie within ``window_days``, have the target's sign and not
+    exceed it; at most ``max_candidates`` (closest in date) are searched per
+    group, for at most ``time_budget_ms``, and the whole tier stops after
+    ``max_searches`` subset-sum searches (None: no limit) with the groups found
+    so far; a count rather than a clock, so the result doesn't depend on load.
+    ``erp_free``/``bank_free`` are updated in place.
+    """
+    erp_c, bank_c = cents(erp_df), cents(bank_df)
+    erp_ok = erp_free & ~np.isnan(erp_c) & ~np.isnan(erp_day) & (erp_c != 0)
+    bank_ok = bank_free & ~np.isnan(bank_c) & ~np.isnan(bank_day) & (bank_c != 0)
+    links: List[tuple] = []
+    group = searches = 0
+
+    def search(target: int, day: float, cands: np.ndarray, cents: np.ndarray, days: np.ndarray) -> Optional[np.ndarray]:
+        nonlocal searches
+        c = cents[cands]
+        keep = (np.sign(c) == np.sign(target)) & (np.abs(c) <= abs(target)) & (np.abs(days[cands] - day) <= window_days)
+        cands = cands[keep]
+        if len(cands) < _MIN_ITEMS:
+            return None
+        if len(cands) > max_candidates:
+            cands = cands[np.argsort(np.abs(days[cands] - day), kind="stable")[:max_candidates]]
+        if abs(cents[cands].sum()) < abs(target):
+            return None
+        searches += 1
+        hit = subset_sum(cents[cands].astype(np.int64), int(target), max_items, time.perf_counter() + time_budget_ms / 1000)
+        return None if hit is None else cands[hit]
+
+    bank_by_inv = _groups_by(bank_df["Invoice ID"].reset_index(drop=True)) if "Invoice ID" in bank_df.columns else {}
+    erp_inv = erp_df["Invoice ID"].reset_index(drop=True) if "Invoice ID" in erp_df.columns else pd.Series(None, index=range(len(erp_df)), dtype=object)
+    for i in np.flatnonzero(erp_ok):
+        if max_searches is not None and searches >= max_searches:
+            break
+        rows = bank_by_inv.get(erp_inv[i])
+        if rows is None or not erp_free[i]:
+            continue
+        rows = rows[bank_ok[rows] & bank_free[rows]]
+        hit = search(erp_c[i], erp_day[i], rows, bank_c, bank_day)
+        if hit is not None:
+            links += [(group, i, j, False) for j in hit]
+            group += 1
+            erp_free[i] = False; bank_free[hit] = False
+
+    erp_by_inv = _groups_by(erp_inv)
+    by_day = np.flatnonzero(erp_ok)
+    by_day = by_day[np.argsort(erp_day[by_day], kind="stable")]
+    sorted_days = erp_day[by_day]
+    desc = bank_df["Description"].reset_index(drop=True) if "Description" in bank_df.columns else None
+    for j in np.flatnonzero(bank_ok & bank_free):
+        if max_searches is not None and searches >= max_searches:
+            break
+        refs = {"INV" + d.zfill(4) for d in _INV_RE.findall(str(desc[j]))} if desc is not None else set()
+        if refs:
+            rows = np.concatenate([erp_by_inv.get(r, np.empty(0, dtype=int)) for r in sorted(refs)])
+        elif not by_date:
+            continue
+        else:
+            lo = np.searchsorted(sorted_days, bank_day[j] - window_days, side="left")
+            hi = np.searchsorted(sorted_days, bank_day[j] + window_days, side="right")
+            mid = np.searchsorted(sorted_days, bank_day[j])
+            rows = by_day[max(lo, mid - 2 * max_candidates):min(hi, mid + 2 * max_candidates)]
+        rows = rows[erp_ok[rows] & erp_free[rows]]
+        hit = search(bank_c[j], bank_day[j], rows, erp_c, erp_day)
+        if hit is not None:
+            links += [(group, i, j, not refs) for i in hit]
+            group += 1
+            bank_free[j] = False; erp_free[hit] = False
+
+    links = np.array(links, dtype=int).reshape(-1, 4)
+    return pd.DataFrame({"group": links[:, 0], "erp_index": links[:, 1], "bank_index": links[:, 2], "by_date": links[:, 3].astype(bool)})
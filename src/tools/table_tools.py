@@ -0,0 +1,104 @@
+from typing import Dict, Any, List
+import numpy as np
+import pandas as pd
+
+# Internal schema of normalized frames: dates as Int32 day numbers since 1970-01-01,
+# amounts (and amount_diff) as Int64 integer cents, IDs/status as categoricals, free text as Arrow strings.
+# Display formats (ISO dates, decimal amounts, plain strings) only at the edges, via to_display.
+DAY_COLUMNS = ("Date",)
+CENT_COLUMNS = ("Amount", "amount_diff")
+CATEGORY_COLUMNS = ("Invoice ID", "Status")
+TEXT_COLUMNS = ("Description", "Ref ID")
+
+def as_frame(payload: Dict[str, Any], key: str = "records") -> pd.DataFrame:
+    """
+    Columnar view of a stage payload.
+
+    Stages hand each other ``{"columns": [...], "frame": DataFrame}`` and read the
+    frame directly (no copy). Payloads built elsewhere with a list-of-dicts under
+    ``key`` are still accepted and converted once, and ``{"dataset": path}``
+    payloads (Parquet written by out-of-core runs) are read in full.
+    """
+    frame = payload.get("frame")
+    if frame is not None:
+        return frame
+    if payload.get("dataset"):
+        return compact(pd.read_parquet(payload["dataset"]))
+    return pd.DataFrame(payload.get(key) or [])
+
+def table(df: pd.DataFrame) -> Dict[str, Any]:
+    return {"columns": df.columns.tolist(), "frame": df}
+
+def category_index(values) -> pd.Index:
+    """Categories as Arrow strings when pyarrow is installed (about half the memory of Python str objects)."""
+    try:
+        return pd.Index(values, dtype="string[pyarrow]")
+    except ImportError:
+        return pd.Index(values, dtype=object)
+
+def text(col: pd.Series) -> pd.Series:
+    try:
+        return col.astype("string[pyarrow]")
+    except ImportError:
+        return col
+
+def categorical(col: pd.Series) -> pd.Series:
+    codes, uniques = pd.factorize(col)
+    return pd.Series(pd.Categorical.from_codes(codes, category_index(uniques)), index=col.index)
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Re-apply the categorical and text dtypes, which a concat of frames with
+    different categories or a Parquet round trip turns back into Python objects.
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df and not (isinstance(df[col].dtype, pd.CategoricalDtype) and df[col].cat.categories.dtype != object):
+            df[col] = categorical(df[col].astype(object))
+    for col in TEXT_COLUMNS:
+        if col in df and df[col].dtype == object:
+            df[col] = text(df[col])
+    return df
+
+def cents(df: pd.DataFrame, col: str = "Amount") -> np.ndarray:
+    """Integer cents as float64 (exact below 2**53) with NaN where missing, for vector arithmetic."""
+    if col not in df:
+        return np.full(len(df), np.nan)
+    return df[col].to_numpy(dtype=float, na_value=np.nan)
+
+def days(df: pd.DataFrame, col: str = "Date") -> np.ndarray:
+    """Day numbers as float64 with NaN where missing."""
+    if col not in df:
+        return np.full(len(df), np.nan)
+    return df[col].to_numpy(dtype=float, na_value=np.nan)
+
+def keys(df: pd.DataFrame, col: str = "Invoice ID") -> np.ndarray:
+    """Stripped upper-case string keys ("" where missing), cleaned once per distinct value."""
+    if col not in df.columns:
+        return np.full(len(df), "", dtype=object)
+    codes, uniques = pd.factorize(df[col])
+    cleaned = np.array([str(u).strip().upper() for u in uniques] + [""], dtype=object)
+    return cleaned[codes]
+
+def to_display(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of ``df`` with day numbers as ISO dates, cents as decimal amounts and categoricals as plain values."""
+    out = df.copy(deep=False)
+    for col in DAY_COLUMNS:
+        if col in out and pd.api.types.is_integer_dtype(out[col].dtype):
+            iso = pd.to_datetime(days(out, col), unit="D").strftime("%Y-%m-%d")
+            out[col] = np.where(out[col].isna(), None, iso.to_numpy(dtype=object))
+    for col in CENT_COLUMNS:
+        if col in out and pd.api.types.is_integer_dtype(out[col].dtype):
+            out[col] = cents(out, col) / 100
+    for col in out.columns:
+        if isinstance(out[col].dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            out[col] = out[col].astype(object).where(out[col].notna(), None)
+    return out
+
+def to_records(payload: Dict[str, Any], key: str = "records") -> List[Dict[str, Any]]:
+    """List-of-dicts form of a stage payload, for the edges (UI, JSON export) only."""
+    frame = payload.get("frame")
+    if frame is None:
+        return list(payload.get(key) or [])
+    frame = to_display(frame)
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict(orient="records")
@@ -1,43 +1,103 @@
+import hashlib
+import json
 import streamlit as st
 import pandas as pd
 from src.agents.coordinator import run_pipeline
+from src.tools.match_tools import SIDES, CandidateIndex
+from src.tools.table_tools import as_frame, to_display
 from src.config import settings
 import sys, os
 sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
 
+PAGE_SIZES = (50, 100, 500, 1000)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _reconcile(erp_key: str, bank_key: str, out_dir: str, profile: bool, _erp_bytes: bytes, _bank_bytes: bytes):
+    """One pipeline run per (ERP hash, bank hash, output directory, profiling); reruns and repeat uploads reuse it."""
+    if profile:
+        return run_pipeline(_erp_bytes, _bank_bytes, out_dir=out_dir, profile=True, profile_sample_rate=1.0)
+    return run_pipeline(_erp_bytes, _bank_bytes, out_dir=out_dir)
+
+def _reader(path: str):
+    """Deferred download: the file is only read when its button is clicked."""
+    def read() -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+    return read
+
 st.set_page_config(page_title="Agentic Reconciliation", page_icon="🧮", layout="wide")
 st.title("🧮 Agentic Financial Reconciliation")
 
-st.markdown("Upload **ERP (Excel)** and **Bank (PDF)**, then run a fully agentic reconciliation pipeline.")
+st.markdown("Upload **ERP (Excel/CSV/Parquet)** and **Bank (PDF)**, then run a fully agentic reconciliation pipeline.")
 
-erp_file = st.file_uploader("Upload ERP Excel", type=["xlsx", "xls"])
+erp_file = st.file_uploader("Upload ERP file", type=["xlsx", "xls", "csv", "parquet"])
 bank_file = st.file_uploader("Upload Bank PDF", type=["pdf"])
 
 out_dir = st.text_input("Output directory", value=settings.out_dir)
+profile = st.checkbox("Profile this run", help="Write per-stage hot functions, allocation sites and collapsed stacks to the run directory")
 
 if st.button("Run Reconciliation", type="primary", disabled=not (erp_file and bank_file)):
+    erp_bytes, bank_bytes = erp_file.getvalue(), bank_file.getvalue()
     with st.spinner("Running agents..."):
-        result = run_pipeline(erp_file.read(), bank_file.read(), out_dir=out_dir)
+        st.session_state["result"] = _reconcile(hashlib.sha256(erp_bytes).hexdigest(), hashlib.sha256(bank_bytes).hexdigest(),
+                                                out_dir, profile, erp_bytes, bank_bytes)
+    st.session_state["disc"] = as_frame(st.session_state["result"]["discrepancies"], "results")
+    st.session_state.pop("candidates", None)
 
-    st.success("Done!")
+result = st.session_state.get("result")
+if result is not None:
+    st.success(f"Done! Run {result['run_id']}")
     st.subheader("Summary")
-    disc = result["discrepancies"]["results"]
-    disc_df = pd.DataFrame(disc)
-    st.dataframe(disc_df, use_container_width=True)
+    disc = st.session_state["disc"]
+    counts = disc["status"].value_counts()
+    st.dataframe(counts.rename("rows"), width="content")
+
+    statuses = st.multiselect("Filter by status", options=counts.index.tolist())
+    view = disc[disc["status"].isin(statuses)] if statuses else disc
+    left, right = st.columns(2)
+    page_size = left.selectbox("Rows per page", PAGE_SIZES, index=1)
+    pages = max(1, -(-len(view) // page_size))
+    page = right.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+    # Only the visible page is converted to display values and sent to the browser.
+    st.dataframe(to_display(view.iloc[(page - 1) * page_size:page * page_size]), width="stretch")
+    st.caption(f"{len(view)} of {len(disc)} rows · page {page} of {pages}")
+
+    if result["matches"] is not None:
+        with st.expander("Candidates for a row"):
+            with st.form("candidates-form", border=False):
+                a, b, c = st.columns(3)
+                side = a.radio("Side", SIDES, format_func=str.upper, horizontal=True)
+                row = b.number_input("Row index", min_value=0, value=0, step=1)
+                k = c.number_input("Candidates", min_value=1, max_value=50, value=5, step=1)
+                submitted = st.form_submit_button("Show candidates")
+            if submitted:
+                # Indexes are built on the first query of a run and reused for the next ones.
+                if "candidates" not in st.session_state:
+                    st.session_state["candidates"] = CandidateIndex(as_frame(result["erp"]), as_frame(result["bank"]))
+                try:
+                    st.dataframe(st.session_state["candidates"].candidates(int(row), side, int(k)), width="stretch", hide_index=True)
+                except ValueError as e:
+                    st.error(str(e))
 
     st.subheader("Outputs")
-    st.write("CSV:", result["outputs"]["csv"])
-    st.write("Excel:", result["outputs"]["xlsx"])
-    st.write("PDF:", result["outputs"]["pdf"])
+    outputs = {fmt: path for fmt, path in result["outputs"].items() if path}
+    for fmt, path in outputs.items():
+        st.write(f"{fmt.upper()}:", path)
     st.write("Mermaid Diagram:", result["diagram"]["mermaid_path"])
+    profile_paths = result.get("profile") or {}
+    for path in list(outputs.values()) + [result["diagram"]["mermaid_path"]] + list(profile_paths.values()):
+        name = os.path.basename(path)
+        st.download_button(f"Download {name}", data=_reader(path), file_name=name, on_click="ignore", key=f"download-{name}")
 
-    st.subheader("Agent Logs")
-    logs = result["logs"]["logs"]
-    st.json(logs)
+    if profile_paths:
+        with st.expander("Profile"):
+            with open(profile_paths["json"]) as f:
+                stages = json.load(f)["stages"]
+            stage = st.selectbox("Stage", list(stages))
+            st.dataframe(pd.DataFrame(stages[stage]["functions"]), width="stretch", hide_index=True)
+            st.dataframe(pd.DataFrame(stages[stage]["allocations"]), width="stretch", hide_index=True)
 
-    st.download_button("Download reconciled.csv", data=open(result["outputs"]["csv"], "rb").read(), file_name="reconciled.csv")
-    st.download_button("Download reconciled.xlsx", data=open(result["outputs"]["xlsx"], "rb").read(), file_name="reconciled.xlsx")
-    st.download_button("Download summary.pdf", data=open(result["outputs"]["pdf"], "rb").read(), file_name="summary.pdf")
-    st.download_button("Download workflow.mmd", data=open(result["diagram"]["mermaid_path"], "rb").read(), file_name="workflow.mmd")
+    with st.expander(f"Agent Logs ({len(result['logs']['logs'])} entries)"):
+        st.dataframe(pd.DataFrame(result["logs"]["logs"]), width="stretch")
 
 st.caption("Model & temperature in `src/config.py`. Provide your API key via env var `GOOGLE_API_KEY`.")
@@ -0,0 +1,19 @@
+import os
+import pytest
+from src.tools.file_tools import read_bank_pdf, read_erp_excel
+from src.tools.normalize_tools import normalize_bank, normalize_erp
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Example_files")
+
+@pytest.fixture(scope="session")
+def example_bytes():
+    with open(os.path.join(EXAMPLES, "erp_data.xlsx"), "rb") as erp, open(os.path.join(EXAMPLES, "bank_statement.pdf"), "rb") as bank:
+        return erp.read(), bank.read()
+
+@pytest.fixture(scope="session")
+def example(example_bytes):
+    """Normalized ERP and bank payloads of the example files."""
+    erp_bytes, bank_bytes = example_bytes
+    erp = normalize_erp.invoke({"payload": read_erp_excel.invoke({"file_bytes": erp_bytes})})
+    bank = normalize_bank.invoke({"payload": read_bank_pdf.invoke({"file_bytes": bank_bytes})})
+    return {"erp": erp, "bank": bank}
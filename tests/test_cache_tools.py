@@ -0,0 +1,29 @@
+import pandas as pd
+from src.agents.coordinator import run_pipeline
+from src.config import settings
+from src.tools.cache_tools import ExtractionCache
+from src.tools.table_tools import compact
+
+def test_round_trip_keeps_normalized_frame(example, tmp_path):
+    cache = ExtractionCache(str(tmp_path), 2**30)
+    key = ExtractionCache.key("erp", "1", b"erp bytes")
+    assert cache.get(key) is None
+    cache.put(key, example["erp"]["frame"])
+    pd.testing.assert_frame_equal(compact(cache.get(key)), example["erp"]["frame"])
+    assert ExtractionCache.key("erp", "2", b"erp bytes") != key
+
+def test_second_run_loads_from_cache(example_bytes, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "layout_dir", str(tmp_path / "layouts"))
+    runs = [run_pipeline(*example_bytes, out_dir=str(tmp_path / "out"), tools_only=True) for _ in range(2)]
+    hits = [sum(e["action"] == "cache_hit" for e in r["logs"]["logs"]) for r in runs]
+    assert hits == [0, 2]
+    pd.testing.assert_frame_equal(runs[1]["discrepancies"]["frame"], runs[0]["discrepancies"]["frame"])
+
+def test_put_skips_frames_pyarrow_cannot_store(tmp_path):
+    cache = ExtractionCache(str(tmp_path), 2**30)
+    for i, col in enumerate(([1, "x"], [1 + 2j, 3j], [{1: 2}, {1: 3}])):
+        key = ExtractionCache.key("erp", "1", bytes([i]))
+        cache.put(key, pd.DataFrame({"c": col}))
+        assert cache.get(key) is None
+    assert not list(tmp_path.iterdir())
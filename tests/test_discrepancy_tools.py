@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+from src.tools.discrepancy_tools import classify_frames, duplicate_keys
+
+def test_missing_invoice_ids_are_not_duplicates():
+    df = pd.DataFrame({"Invoice ID": ["INV0001", None, "", "nan", "NAN", None, " inv0001"]})
+    assert duplicate_keys(df) == {"INV0001"}
+
+def test_classify_frames_labels_pairs_and_unmatched_rows():
+    erp = pd.DataFrame({"Invoice ID": ["INV0001", "INV0002", "INV0003", "INV0004", "INV0004", "INV0005"],
+                        "Amount": [1000, 1000, 1000, 1000, 1000, 1000]})
+    bank = pd.DataFrame({"Invoice ID": ["INV0001", "INV0002", "INV0003", "INV0004", "INV0009"],
+                         "Amount": [1000, 1004, 1100, 1000, 500]})
+    matches = {"matches": pd.DataFrame({"erp_index": [0, 1, 2, 3], "bank_index": [0, 1, 2, 3]}),
+               "erp_unmatched": np.array([4, 5]), "bank_unmatched": np.array([4])}
+    out = classify_frames(erp, bank, matches)
+    assert out["status"].tolist() == ["Matched", "Rounding difference", "Amount mismatch", "Duplicate",
+                                      "Missing in Bank", "Missing in Bank", "Missing in ERP"]
+    assert out["amount_diff"].tolist()[:4] == [0, 4, 100, 0]
+    assert out["erp_index"].isna().tolist() == [False] * 6 + [True]
@@ -0,0 +1,17 @@
+from src.agents.coordinator import run_pipeline
+from src.config import settings
+from src.tools.file_tools import read_erp_excel
+
+def test_ledger_reports_only_the_delta(example_bytes, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "cache_dir", "")
+    monkeypatch.setattr(settings, "layout_dir", str(tmp_path / "layouts"))
+    erp_bytes, bank_bytes = example_bytes
+    erp = read_erp_excel.invoke({"file_bytes": erp_bytes})["frame"]
+    first, full = erp.head(150).to_csv(index=False).encode(), erp.to_csv(index=False).encode()
+    runs = [run_pipeline(b, bank_bytes, out_dir=str(tmp_path / "out"), tools_only=True, ledger_dir=str(tmp_path / "ledger"))
+            for b in (first, full, full)]
+    deltas = [(r["delta"]["new_erp_rows"], r["delta"]["new_bank_rows"], r["delta"]["changed"]) for r in runs]
+    assert deltas == [(150, 208, 218), (50, 0, 50), (0, 0, 0)]
+    # Pairs closed over the two runs are the pairs a single full run matches.
+    matched = sum((r["discrepancies"]["frame"]["status"] == "Matched").sum() for r in runs)
+    assert matched == 165
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from src.tools.discrepancy_tools import classify_discrepancies
+from src.tools.match_tools import _candidate_index, match_candidates, match_records
+
+def test_example_files_match_baseline(example):
+    matches = match_records.invoke({"payload": example})
+    result = classify_discrepancies.invoke({"payload": {**example, "matches": matches}})["frame"]
+    assert result["status"].value_counts().to_dict() == {"Matched": 165, "Missing in ERP": 28, "Missing in Bank": 20,
+                                                         "Duplicate": 8, "Amount mismatch": 7}
+
+def test_process_pool_matches_serial(example):
+    serial = match_records.invoke({"payload": example})
+    pooled = match_records.invoke({"payload": example, "processes": 2})
+    pd.testing.assert_frame_equal(pooled["matches"], serial["matches"])
+    for key in ("erp_unmatched", "bank_unmatched"):
+        assert np.array_equal(pooled[key], serial[key])
+    payload = {**example, "matches": serial}
+    pd.testing.assert_frame_equal(classify_discrepancies.invoke({"payload": payload, "processes": 2})["frame"],
+                                  classify_discrepancies.invoke({"payload": payload})["frame"])
+
+def test_match_candidates_reuses_index_per_payload(example):
+    first = match_candidates.invoke({"payload": example, "rows": [0, 1], "k": 3})["candidates"]
+    index = _candidate_index(example["erp"]["frame"], example["bank"]["frame"])
+    again = match_candidates.invoke({"payload": example, "rows": [0, 1], "k": 3})["candidates"]
+    assert _candidate_index(example["erp"]["frame"], example["bank"]["frame"]) is index
+    pd.testing.assert_frame_equal(again, first)
+    pd.testing.assert_frame_equal(first, index.top_k([0, 1], side="erp", k=3))
@@ -0,0 +1,46 @@
+import pandas as pd
+from src.tools.discrepancy_tools import classify_discrepancies
+from src.tools.match_tools import match_records
+from src.tools.normalize_tools import normalize_bank, normalize_erp
+from src.tools.table_tools import table
+
+def _erp(ids):
+    return normalize_erp.invoke({"payload": table(pd.DataFrame({
+        "Date": ["2025-01-0%d" % (i + 1) for i in range(len(ids))], "Invoice ID": ids,
+        "Amount": ["%d.00" % (100 * (i + 1)) for i in range(len(ids))], "Status": ["paid"] * len(ids)}))})
+
+def test_amounts_become_integer_cents():
+    raw = pd.DataFrame({"Amount": ["1,234.50", "(12.30)", "7.5-", "  42 ", "", "n/a", "$ 1,000"]})
+    df = normalize_erp.invoke({"payload": table(raw)})["frame"]
+    assert str(df["Amount"].dtype) == "Int64"
+    assert df["Amount"].tolist()[:4] == [123450, -1230, -750, 4200]
+    assert df["Amount"].iloc[4:6].isna().all() and df["Amount"].iloc[6] == 100000
+
+def test_decimal_comma_amounts():
+    raw = pd.DataFrame({"Amount": ["1.234,50", "0,99", "12,3"]})
+    assert normalize_erp.invoke({"payload": table(raw)})["frame"]["Amount"].tolist() == [123450, 99, 1230]
+
+def test_dates_become_day_numbers():
+    raw = pd.DataFrame({"Date": ["2025-01-02", "2025-01-03", "3 Jan 2025", "", None, "not a date"]})
+    df = normalize_erp.invoke({"payload": table(raw)})["frame"]
+    assert str(df["Date"].dtype) == "Int32"
+    day = (pd.Timestamp("2025-01-02") - pd.Timestamp("1970-01-01")).days
+    assert df["Date"].tolist()[:3] == [day, day + 1, day + 1]
+    assert df["Date"].iloc[3:].isna().all()
+
+def test_missing_erp_invoice_ids_stay_missing():
+    df = _erp([" inv0001 ", None, "  ", float("nan")])["frame"]
+    assert isinstance(df["Invoice ID"].dtype, pd.CategoricalDtype)
+    assert df["Invoice ID"].iloc[0] == "INV0001"
+    assert df["Invoice ID"].iloc[1:].isna().all()
+
+def test_missing_erp_invoice_ids_match_by_amount():
+    erp = _erp([None, None, "INV0003"])
+    bank = normalize_bank.invoke({"payload": table(pd.DataFrame({
+        "Date": ["2025-01-01", "2025-01-02", "2025-01-03"], "Description": ["Card payment", "Transfer", "Payment INV-0003"],
+        "Amount": ["100.00", "200.00", "300.00"]}))})
+    payload = {"erp": erp, "bank": bank}
+    matches = match_records.invoke({"payload": payload})
+    assert sorted(matches["matches"][["erp_index", "bank_index"]].itertuples(index=False, name=None)) == [(0, 0), (1, 1), (2, 2)]
+    result = classify_discrepancies.invoke({"payload": {**payload, "matches": matches}})["frame"]
+    assert (result["status"] == "Matched").all()
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+from src.tools.split_tools import find_splits, subset_sum
+
+def test_subset_sum_finds_pair_among_equal_right_sums():
+    # 3 + 3 (positions 2 and 6); the right half also sums to 3 as 1 + 2.
+    assert subset_sum(np.array([1, 2, 3, 10, 1, 2, 3, 6]), 6, max_items=2).tolist() == [2, 6]
+
+def test_subset_sum_returns_smallest_group():
+    assert len(subset_sum(np.array([1, 2, 3, 10, 1, 2, 3, 6]), 6, max_items=5)) == 2
+
+def test_find_splits_stops_after_max_searches():
+    # Three invoices, each paid in two instalments carrying its Invoice ID.
+    erp = pd.DataFrame({"Invoice ID": ["INV0001", "INV0002", "INV0003"], "Amount": [300, 500, 700]})
+    bank = pd.DataFrame({"Invoice ID": ["INV0001", "INV0001", "INV0002", "INV0002", "INV0003", "INV0003"],
+                         "Amount": [100, 200, 200, 300, 300, 400]})
+    def run(max_searches):
+        return find_splits(erp, bank, np.zeros(3), np.zeros(6), np.ones(3, dtype=bool), np.ones(6, dtype=bool),
+                           max_searches=max_searches)["group"].nunique()
+    assert [run(n) for n in (None, 2, 0)] == [3, 2, 0]